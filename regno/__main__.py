@@ -7,11 +7,19 @@ from __future__ import absolute_import, unicode_literals
 import argparse
 import json
 import logging
+import random
+import signal
 import sys
 
-from .cards import random_set
-from .core import Game
-from .utils import class_from_path
+from collections import Counter
+from contextlib import contextmanager
+
+from . import checkpoint, columns, trace
+from .cache import Cache, cached_run
+from .instrument import Timings
+from .progress import Progress
+from .runner import run
+from .utils import class_from_path, win_rate_intervals
 
 LOGGER = logging.getLogger(__name__)
 
@@ -27,19 +35,93 @@ def parse_args():
                         help='card collection')
     parser.add_argument('-g', '--games', type=int, default=10,
                         help='number of games')
+    parser.add_argument('--seed', type=int,
+                        help='seed of the run, every game gets its own seed derived from it '
+                             '(0 <= SEED < 2**63)')
+    parser.add_argument('--replay', type=int,
+                        help='only play game number REPLAY of the seeded run')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of worker processes')
+    parser.add_argument('--chunksize', type=int,
+                        help='number of games sent to a worker at a time')
+    parser.add_argument('-p', '--precision', type=float,
+                        help='stop as soon as the 95%% confidence intervals of all win rates '
+                             'are narrower than this; --games is the maximum then')
+    parser.add_argument('-e', '--engine', choices=('object', 'batch'), default='object',
+                        help='object: regular games; batch: vectorized games, only for '
+                             'strategies that play nothing but base cards (requires NumPy)')
+    parser.add_argument('--cross-check', action='store_true',
+                        help='compare the win rates of both engines instead')
+    parser.add_argument('-f', '--format', choices=('json', 'ndjson', 'stats'), default='json',
+                        help='json: all summaries and the stats at the end; '
+                             'ndjson: one summary per line as soon as a game is done, '
+                             'the stats on the last line; stats: only the running win counts')
+    parser.add_argument('-o', '--output',
+                        help='CSV or NPZ file with a row per game and seat, see regno.columns')
+    parser.add_argument('--trace',
+                        help='binary file to record every turn of every game in, see regno.trace')
+    parser.add_argument('--max-turns', type=int,
+                        help='cut games short after this many turns (default: 10000)')
+    parser.add_argument('--stall-rounds', type=int,
+                        help='cut games short once the supply has not changed for this many '
+                             'rounds')
+    parser.add_argument('--cache',
+                        help='SQLite file to cache game results in, only missing games are played '
+                             '(requires --seed)')
+    parser.add_argument('--checkpoint',
+                        help='file to save the progress of the run to, see --resume; not with '
+                             '--format json, which only writes the summaries at the end')
+    parser.add_argument('--checkpoint-interval', type=float, default=60.,
+                        help='seconds between checkpoints')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the run saved in the --checkpoint file; if the run was '
+                             'killed rather than interrupted with Ctrl-C, the ndjson lines of '
+                             'games after the checkpoint are written again, with the same '
+                             '"game" numbers')
+    parser.add_argument('-t', '--timings', action='store_true',
+                        help='time phases, strategy decisions and cards, report on stderr')
+    parser.add_argument('--progress', type=float, nargs='?', const=1.,
+                        help='show games done, games/s, time left and win rates on stderr, '
+                             'refreshed every PROGRESS seconds (default: 1)')
     parser.add_argument('-v', '--verbose', action='count', default=0,
                         help='log verbosity (repeat to increase)')
 
     return parser.parse_args()
 
+@contextmanager
+def deferred_interrupt():
+    """holds Ctrl-C back until the block is done, where signals can be blocked"""
+
+    if not hasattr(signal, 'pthread_sigmask'):
+        yield
+        return
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGINT})
+    try:
+        yield
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGINT})
+
+def dump(obj, fmt, file=None):
+    """prints the object as JSON, on a single line for the ndjson format"""
+
+    if fmt == 'ndjson':
+        print(json.dumps(obj, separators=(',', ':')), file=file or sys.stdout)
+    else:
+        print(json.dumps(obj, indent=4), file=file or sys.stdout)
+
 def main():
     """main function"""
 
     args = parse_args()
 
-    logging.basicConfig(stream=sys.stdout,
+    # stdout is for the results only
+    logging.basicConfig(stream=sys.stderr,
                         level=logging.WARNING - 10 * args.verbose)
 
+    # seeds are stored as signed 64 bit integers, e.g., in traces and the cache
+    if args.seed is not None and not 0 <= args.seed < 2 ** 63:
+        raise ValueError('the seed must be at least 0 and less than 2**63')
+
     strategies = []
     for strategy in args.strategies:
         cls = class_from_path(strategy)
@@ -54,7 +136,12 @@ def main():
         raise ValueError('specify 4 strategies (repeat if necessary)')
 
     stats = {strategy.__name__: 0 for strategy in strategies}
+    seats = Counter(strategy.__name__ for strategy in strategies)
     summaries = []
+    played = 0
+    # games cut short by max_turns or stall_rounds, they have no winners
+    truncated = 0
+    timings = Timings()
 
     module = class_from_path(args.set)
     LOGGER.info('choosing sets from %s', module.__name__)
@@ -63,22 +150,192 @@ def main():
     LOGGER.info('fixed cards for every set: [%s]',
                 ', '.join(sorted(card.__name__ for card in args_cards)))
 
-    for i in range(args.games):
-        LOGGER.info('#######################################################')
-        LOGGER.info('##################### Game #%05d #####################', i + 1)
-        LOGGER.info('#######################################################')
-        cards = random_set(module, cards=args_cards)
-        LOGGER.info('supply: [%s]', ', '.join(sorted(card.__name__ for card in cards)))
-        game = Game(cards, [strategy() for strategy in strategies])
-
-        game.play()
-        summary = game.stats
-        summaries.append(summary)
-        for winner in summary['winners']:
-            stats[winner] += 1
-
-    print(json.dumps(summaries, indent=4))
-    print(json.dumps(stats, indent=4))
+    # arguments for Game
+    options = {}
+    if args.max_turns is not None:
+        options['max_turns'] = args.max_turns
+    if args.stall_rounds is not None:
+        options['stall_rounds'] = args.stall_rounds
+
+    # everything but the seed and the number of games that determines the output,
+    # a checkpoint can only be resumed with the same setup
+    setup = {
+        'strategies': args.strategies,
+        'set': args.set,
+        'cards': sorted(args.card),
+        'replay': args.replay,
+        'engine': args.engine,
+        'format': args.format,
+        'output': args.output,
+        'trace': args.trace,
+        'options': options,
+    }
+
+    if args.checkpoint and args.format == 'json':
+        # the summaries would have to be saved again with every checkpoint
+        raise ValueError('--checkpoint does not work with --format json, use ndjson instead')
+
+    state = None
+    if args.resume:
+        if not args.checkpoint:
+            raise ValueError('specify the --checkpoint to resume')
+        state = checkpoint.load(args.checkpoint)
+        if state['setup'] != setup:
+            raise ValueError('the checkpoint {} belongs to a run with a different setup: {}'
+                             .format(args.checkpoint, state['setup']))
+        args.seed = state['seed']
+
+    if args.seed is None:
+        if args.cache:
+            # a random seed would never be found in the cache
+            raise ValueError('specify the --seed to use the --cache')
+        args.seed = random.SystemRandom().getrandbits(63)
+    LOGGER.info('seed of this run: %d', args.seed)
+
+    if args.cross_check:
+        from .batch import cross_check
+        print(json.dumps(cross_check(strategies, games=args.games, seed=args.seed), indent=4))
+        return
+
+    if args.replay is not None:
+        start, games = args.replay - 1, 1
+    else:
+        start, games = 0, args.games
+
+    if state:
+        played = state['played']
+        stats = state['stats']
+        truncated = state['truncated']
+        timings.update(state['timings'])
+        LOGGER.info('resuming after %d games', played)
+
+    if args.trace and (args.cache or args.engine != 'object'):
+        raise ValueError('only games played by the object engine without cache can be traced')
+    if args.timings and args.engine != 'object':
+        raise ValueError('only games played by the object engine can be timed')
+
+    if args.output:
+        cards = columns.card_names(module, args_cards)
+        output = columns.writer(args.output, cards, state['output'] if state else None)
+    else:
+        output = None
+
+    tracer = trace.Writer(args.trace, args.seed, state['trace'] if state else None) \
+        if args.trace else None
+
+    def save():
+        saver.save({
+            'setup': setup,
+            'seed': args.seed,
+            'next': start + played,
+            'played': played,
+            'stats': stats,
+            'truncated': truncated,
+            'timings': timings.as_dict(),
+            'output': output.position() if output else None,
+            'trace': tracer.position() if tracer else None,
+        })
+
+    saver = checkpoint.Checkpoint(args.checkpoint, args.checkpoint_interval) \
+        if args.checkpoint else None
+
+    # the batch engine and the cache only return summaries, the rows are taken from them
+    rows = bool(args.output) and args.engine == 'object'
+
+    def play(start, games, summaries=args.format != 'stats' or bool(args.output) and not rows):
+        return run(strategies, module=args.set, cards=args_cards, games=games, start=start,
+                   seed=args.seed, workers=args.workers, chunksize=args.chunksize,
+                   summaries=summaries, engine=args.engine, timings=args.timings,
+                   columns=rows, trace=bool(tracer), **options)
+
+    if args.cache:
+        cache = Cache(args.cache)
+        key = cache.key(strategies, args.set, args_cards, args.seed, engine=args.engine,
+                        **options)
+        results = cached_run(cache, key, lambda start, games: play(start, games, True),
+                             start + played, games - played)
+    else:
+        results = play(start + played, games - played)
+
+    progress = Progress(games - played, seats, args.progress) if args.progress else None
+
+    try:
+        for result in results:
+            # writing the result and counting it must not be torn apart by Ctrl-C,
+            # or the checkpoint would be out of step with the output
+            with deferred_interrupt():
+                if progress:
+                    progress.update(result)
+
+                if args.format == 'json':
+                    summaries.extend(result['summaries'])
+                elif args.format == 'ndjson':
+                    for summary in result['summaries']:
+                        sys.stdout.write(json.dumps(summary, separators=(',', ':')))
+                        sys.stdout.write('\n')
+                    sys.stdout.flush()
+
+                if output:
+                    table = columns.Columns(cards)
+                    if result['columns'] is not None:
+                        table.extend(result['columns'])
+                    else:
+                        for summary in result['summaries']:
+                            table.add_summary(summary)
+                    output.write(table)
+
+                if tracer:
+                    tracer.write(result['trace'])
+
+                for winner, count in result['wins'].items():
+                    stats[winner] += count
+                played += result['games']
+                truncated += result['truncated']
+                if result['timings']:
+                    timings.update(result['timings'])
+
+                if saver and saver.due():
+                    save()
+
+                if args.precision and all(
+                        high - low < args.precision
+                        for low, high in win_rate_intervals(stats, seats, played).values()):
+                    LOGGER.info('reached the precision after %d games', played)
+                    break
+
+    except KeyboardInterrupt:
+        if not saver:
+            raise
+        save()
+        # terminates the worker processes
+        results.close()
+        if output:
+            output.close()
+        if tracer:
+            tracer.close()
+        LOGGER.warning('interrupted after %d games, continue with --resume', played)
+        sys.exit(130)
+
+    if saver:
+        save()
+    if output:
+        output.close()
+    if tracer:
+        tracer.close()
+
+    if progress:
+        progress.close()
+
+    if args.format == 'json':
+        dump(summaries, args.format)
+    dump(dict(stats, truncated=truncated) if truncated else stats, args.format)
+
+    if args.timings:
+        print(timings.report(), file=sys.stderr)
+
+    if args.precision:
+        dump({'games': played, 'intervals': win_rate_intervals(stats, seats, played)},
+             args.format)
 
 if __name__ == '__main__':
     main()
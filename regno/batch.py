@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+"""vectorized engine that plays thousands of treasure and victory card games at once
+
+Only strategies that buy cards from the base set (and play nothing but treasures) can be
+simulated this way. Instead of card lists, every player's deck, hand and discard pile is
+a vector of card counts, and all games of a batch advance in lockstep with NumPy. Since
+shuffled decks are drawn uniformly at random, drawing from the counts gives the same
+distribution of games as the object engine in regno.core.
+
+Games are seeded in fixed blocks of BLOCK games, so the result of a game depends only on
+the seed and its number, not on how the run is split into chunks.
+
+Requires NumPy."""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import logging
+import math
+import random
+
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .cards import random_set
+from .cards.base import BASESET, Copper, Estate, Province
+from .core import Strategy
+from .strategies import BigMoney, Smarter
+
+LOGGER = logging.getLogger(__name__)
+
+CARDS = BASESET
+INDEX = {card: i for i, card in enumerate(CARDS)}
+
+# number of games that share a random generator
+BLOCK = 1000
+
+class BlockRandom(object):
+    """random numbers for rows of games, from one generator per block of BLOCK games
+
+    The numbers a block draws only depend on its own games, so they are the same no
+    matter which other blocks are played in the same batch."""
+
+    def __init__(self, seed, first, blocks):
+        self.generators = [np.random.default_rng(None if seed is None else [seed, block])
+                           for block in range(first, first + blocks)]
+        self.bounds = np.arange(1, blocks) * BLOCK
+
+    def random(self, rows, *shape):
+        """uniform numbers of shape (len(rows),) + shape for the given rows, in ascending order"""
+
+        parts = np.split(rows, np.searchsorted(rows, self.bounds))
+        return np.concatenate([generator.random((len(part),) + shape)
+                               for generator, part in zip(self.generators, parts)])
+
+def priority_rule(cards):
+    """buy rule: the most expensive of the given cards that is affordable and available"""
+
+    cards = sorted(cards, key=lambda card: -card._cost)
+
+    def rule(money, supply, rng, rows):
+        choice = np.full(len(money), -1)
+        for card in reversed(cards):
+            index = INDEX[card]
+            choice = np.where((money >= card._cost) & (supply[:, index] > 0), index, choice)
+        return choice
+
+    return rule
+
+def random_rule(money, supply, rng, rows):
+    """buy rule of Strategy: any of the most expensive cards that are affordable and available"""
+
+    cost = np.array([card._cost for card in CARDS])
+    affordable = (cost <= money[:, None]) & (supply > 0)
+    best = np.where(affordable, cost, -1).max(axis=1)
+    candidates = affordable & (cost == best[:, None])
+    choice = np.where(candidates, rng.random(rows, len(CARDS)), -1).argmax(axis=1)
+    return np.where(best >= 0, choice, -1)
+
+def smarter_rule(money, supply, rng, rows):
+    """buy rule of Smarter: like Strategy, but no Copper, and no Estate early on"""
+
+    choice = random_rule(money, supply, rng, rows)
+    skip = ((choice == INDEX[Copper])
+            | ((choice == INDEX[Estate]) & (supply[:, INDEX[Province]] > 4)))
+    return np.where(skip, -1, choice)
+
+# strategy class -> vectorized buy rule, which maps the money and supply of a number
+# of games, a BlockRandom and the rows of the games to the index of the card to buy
+# (-1 for none)
+RULES = {
+    Strategy: random_rule,
+    Smarter: smarter_rule,
+    BigMoney: priority_rule(BigMoney.interesting_cards),
+}
+
+# strategies that buy kingdom cards in the object engine, so they can only be simulated
+# on the base set alone
+ANY_CARD = frozenset((Strategy, Smarter))
+
+def supported(strategies, kingdom=False):
+    """whether all strategies can be simulated by the batch engine, with a kingdom or not"""
+
+    return all(strategy in RULES and not (kingdom and strategy in ANY_CARD)
+               for strategy in strategies)
+
+def _draw(rng, games, deck, discard, hand, num):
+    """draws num cards into hand for every row, shuffling the discard pile when the deck runs out
+
+    games are the rows of the games in the BlockRandom rng."""
+
+    rows = np.arange(len(deck))
+
+    for _ in range(num):
+        empty = deck.sum(axis=1) == 0
+        if empty.any():
+            deck[empty] += discard[empty]
+            discard[empty] = 0
+
+        total = deck.sum(axis=1)
+        drawing = total > 0
+        # pick the card at a uniformly random position of the (shuffled) deck
+        position = rng.random(games) * total
+        card = (np.cumsum(deck, axis=1) > position[:, None]).argmax(axis=1)
+        deck[rows[drawing], card[drawing]] -= 1
+        hand[rows[drawing], card[drawing]] += 1
+
+def play_batch(strategies, module=None, cards=(), start=0, games=1, seed=None, summaries=True,
+               max_turns=10000, timings=False, **kwargs):
+    """plays the games with the given strategies on the base set at once
+
+    Returns the same dict as regno.runner.play_games. The kingdom given by module and cards
+    is not played, so strategies that would buy from it (see ANY_CARD) are refused then.
+    Whole blocks of games are played (see BLOCK), and those outside the range are dropped.
+    The results are reproducible for the same seed, but they differ from the games the
+    object engine plays with it. Summaries list the kingdom and seed the object engine
+    would use for the game, see regno.runner.play_game."""
+
+    if np is None:
+        raise RuntimeError('the batch engine requires NumPy')
+
+    if timings:
+        raise ValueError('the batch engine cannot time its games')
+
+    from .runner import game_seed
+
+    if any(kwargs.values()):
+        LOGGER.warning('the batch engine ignores the options %s',
+                       ', '.join(sorted(key for key, value in kwargs.items() if value)))
+
+    strategies = list(strategies)
+    kingdom = module is not None or bool(cards)
+    if not supported(strategies, kingdom):
+        raise ValueError('the batch engine only supports the strategies {}{}'.format(
+            ', '.join(sorted(strategy.__name__ for strategy in RULES)),
+            ', and only {} with a kingdom'.format(', '.join(sorted(
+                strategy.__name__ for strategy in set(RULES) - ANY_CARD))) if kingdom else ''))
+
+    first = start // BLOCK
+    blocks = -(-(start + games) // BLOCK) - first
+    offset = start - first * BLOCK
+    # play whole blocks, but only return the total games from offset on
+    total, games = games, blocks * BLOCK
+    rng = BlockRandom(seed, first, blocks)
+    num_players = len(strategies)
+    money = np.array([card.money for card in CARDS])
+    points = np.array([card.victory_points for card in CARDS])
+    province = INDEX[Province]
+
+    # random seating as in Game: seats[g, p] is the strategy sitting at seat p in game g
+    seats = np.argsort(rng.random(np.arange(games), num_players), axis=1)
+
+    supply = np.tile(np.array([card.supply for card in CARDS]), (games, 1))
+    deck = np.zeros((games, num_players, len(CARDS)), dtype=np.int64)
+    deck[:, :, INDEX[Copper]] = 7
+    deck[:, :, INDEX[Estate]] = 3
+    discard = np.zeros_like(deck)
+    hand = np.zeros_like(deck)
+
+    for seat in range(num_players):
+        _draw(rng, np.arange(games), deck[:, seat], discard[:, seat], hand[:, seat], 5)
+
+    active = np.ones(games, dtype=bool)
+    turns = np.zeros(games, dtype=np.int64)
+
+    for turn in range(max_turns):
+        seat = turn % num_players
+        games_left = np.flatnonzero(active)
+        if not len(games_left):
+            break
+
+        seat_hand = hand[games_left, seat]
+        seat_money = seat_hand @ money
+        seat_supply = supply[games_left]
+        choice = np.full(len(games_left), -1)
+        for i, strategy in enumerate(strategies):
+            playing = seats[games_left, seat] == i
+            if playing.any():
+                choice[playing] = RULES[strategy](
+                    seat_money[playing], seat_supply[playing], rng, games_left[playing])
+
+        buying = choice >= 0
+        supply[games_left[buying], choice[buying]] -= 1
+        seat_discard = discard[games_left, seat] + seat_hand
+        seat_discard[buying, choice[buying]] += 1
+
+        seat_deck = deck[games_left, seat]
+        seat_hand = np.zeros_like(seat_hand)
+        _draw(rng, games_left, seat_deck, seat_discard, seat_hand, 5)
+        deck[games_left, seat] = seat_deck
+        discard[games_left, seat] = seat_discard
+        hand[games_left, seat] = seat_hand
+
+        turns[games_left] = turn + 1
+        supply_left = supply[games_left]
+        finished = (supply_left[:, province] == 0) | ((supply_left == 0).sum(axis=1) >= 3)
+        active[games_left[finished]] = False
+
+    else:
+        LOGGER.warning('%d games did not finish within %d turns',
+                       active[offset:offset + total].sum(), max_turns)
+
+    owned = deck + discard + hand
+    victory_points = owned @ points
+    names = [strategy.__name__ for strategy in strategies]
+    wins = Counter()
+    results = [] if summaries else None
+
+    for game in range(offset, offset + total):
+        max_points = victory_points[game].max()
+        leading = victory_points[game] == max_points
+        # games still active hit max_turns, they are truncated as in Game.play
+        winners = [] if active[game] else [
+            names[seats[game, seat]] for seat in range(num_players) if leading[seat]]
+        wins.update(winners)
+
+        if results is None:
+            continue
+
+        number = first * BLOCK + game
+        sub_seed = game_seed(seed, number)
+        kingdom = random_set(module, cards=cards, rng=random.Random(sub_seed))
+        results.append({
+            'cards': sorted({card.__name__ for card in kingdom}),
+            'max_points': int(max_points),
+            'players': [{
+                'number': seat + 1,
+                'strategy': names[seats[game, seat]],
+                'victory_points': int(victory_points[game, seat]),
+                'leading': bool(leading[seat]),
+                'deck': {CARDS[i].__name__: int(count)
+                         for i, count in enumerate(owned[game, seat]) if count},
+            } for seat in range(num_players)],
+            'current_round': int(turns[game] // num_players) + 1,
+            'current_player': int(turns[game] % num_players) + 1,
+            'winners': winners,
+            'game': number + 1,
+            'seed': sub_seed,
+        })
+        if active[game]:
+            results[-1]['truncated'] = 'max_turns'
+
+    return {'games': total, 'summaries': results, 'wins': wins, 'timings': None, 'columns': None,
+            'trace': None, 'truncated': int(active[offset:offset + total].sum())}
+
+def cross_check(strategies, games=10000, seed=None):
+    """plays the matchup with both engines and compares the win rates of every strategy
+
+    Returns a dict with the win rates of either engine and the z-score of their
+    difference per strategy. Scores beyond about 3 hint at a discrepancy."""
+
+    from .runner import play_games
+
+    batch = play_batch(strategies, games=games, seed=seed, summaries=False)
+    objects = play_games(strategies, games=games, seed=seed, summaries=False)
+
+    report = {}
+    for strategy in strategies:
+        name = strategy.__name__
+        seats = sum(other is strategy for other in strategies) * games
+        rate_batch = batch['wins'][name] / seats
+        rate_objects = objects['wins'][name] / seats
+        pooled = (rate_batch + rate_objects) / 2
+        error = math.sqrt(2 * pooled * (1 - pooled) / seats) or 1
+        report[name] = {
+            'batch': rate_batch,
+            'object': rate_objects,
+            'z': (rate_batch - rate_objects) / error,
+        }
+
+    return report
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""benchmarks games per second, turns per second and peak memory of representative matchups
+
+Run with python -m regno.benchmark. Every case plays the same seeded games on a fixed
+kingdom, so results are comparable between code changes on the same machine. Compare
+against a stored baseline to catch regressions, or save a new baseline with --save.
+
+Throughput depends on the machine, so the baseline in benchmarks/baseline.json has to be
+saved again (with --save) on every machine before comparing against it. Each case is
+timed repeatedly and the median counts. Medians of consecutive runs of the same code
+still differ by 10 to 30% on a busy machine, single runs by even more, hence the default
+tolerance. Run again before trusting a regression on a shared machine."""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from .cards.original import (
+    Cellar, Festival, Gardens, Laboratory, Market, Mine, Smithy, Thief, Witch, Woodcutter)
+from .runner import play_games
+from .strategies import BigMoney, BigMoneySmithy, BigMoneyWitch, Gardener
+
+LOGGER = logging.getLogger(__name__)
+
+KINGDOM = (Cellar, Festival, Gardens, Laboratory, Market, Mine, Smithy, Thief, Witch, Woodcutter)
+
+CASES = {
+    'big-money': (BigMoney, BigMoney, BigMoney, BigMoney),
+    'smithy': (BigMoneySmithy, BigMoneySmithy, BigMoney, BigMoney),
+    'witch': (BigMoneyWitch, BigMoneyWitch, BigMoney, BigMoney),
+    'gardener': (Gardener, Gardener, BigMoney, BigMoney),
+    'mixed': (BigMoney, BigMoneySmithy, BigMoneyWitch, Gardener),
+}
+
+# in the repository, next to the package
+BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'benchmarks', 'baseline.json')
+
+def turns(summary):
+    """number of turns played in the game"""
+
+    players = len(summary['players'])
+    return (summary['current_round'] - 1) * players + summary['current_player'] - 1
+
+def benchmark(strategies, games=200, seed=0, repeat=7, kingdom=KINGDOM):
+    """plays the seeded games repeatedly and returns the median throughput and the peak memory"""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = play_games(strategies, cards=kingdom, games=games, seed=seed)
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+
+    total_turns = sum(turns(summary) for summary in result['summaries'])
+
+    # tracing allocations slows everything down, so memory is measured on a separate game
+    tracemalloc.start()
+    play_games(strategies, cards=kingdom, games=1, seed=seed, summaries=False)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'games_per_second': games / median,
+        'turns_per_second': total_turns / median,
+        'peak_memory': peak,
+    }
+
+def compare(results, baseline, tolerance):
+    """yields (case, metric, baseline, result) for every metric worse than the tolerance allows"""
+
+    for case, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(case, {}).get(metric)
+            if not reference:
+                continue
+            # throughput should not drop, memory should not grow
+            ratio = value / reference if metric == 'peak_memory' else reference / value
+            if ratio > 1 + tolerance:
+                yield case, metric, reference, value
+
+def parse_args():
+    """parse command line arguments"""
+
+    parser = argparse.ArgumentParser(description='benchmark the simulation')
+    parser.add_argument('cases', nargs='*', default=sorted(CASES),
+                        help='cases to run (default: all of {})'.format(', '.join(sorted(CASES))))
+    parser.add_argument('-g', '--games', type=int, default=200,
+                        help='number of games per case')
+    parser.add_argument('-r', '--repeat', type=int, default=7,
+                        help='repetitions per case, the median counts')
+    parser.add_argument('-b', '--baseline', default=BASELINE,
+                        help='baseline file, saved on the same machine')
+    parser.add_argument('-t', '--tolerance', type=float, default=.3,
+                        help='relative slowdown (or memory growth) that counts as regression')
+    parser.add_argument('--save', action='store_true',
+                        help='store the results as the new baseline')
+
+    return parser.parse_args()
+
+def main():
+    """main function"""
+
+    args = parse_args()
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
+
+    results = {}
+    for case in args.cases:
+        results[case] = benchmark(CASES[case], games=args.games, repeat=args.repeat)
+        print('{:<12} {:>10.1f} games/s {:>12.1f} turns/s {:>10.1f} KiB peak'.format(
+            case, results[case]['games_per_second'], results[case]['turns_per_second'],
+            results[case]['peak_memory'] / 1024))
+
+    if args.save:
+        directory = os.path.dirname(args.baseline)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=4, sort_keys=True)
+            file.write('\n')
+        print('saved baseline to {}'.format(args.baseline))
+        return
+
+    if not os.path.exists(args.baseline):
+        LOGGER.error('no baseline at %s, run with --save to create one', args.baseline)
+        sys.exit(1)
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    regressions = list(compare(results, baseline, args.tolerance))
+    for case, metric, reference, value in regressions:
+        print('regression in {} {}: {:.1f} -> {:.1f}'.format(case, metric, reference, value))
+
+    if regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""on-disk SQLite cache of game results
+
+Results are stored per game, keyed on everything that determines the game: the strategies,
+the card collection and fixed cards, the seed of the run, the game's number and a hash of
+the source code of regno and of the modules of the strategies and cards. Results cached for
+the same setup under a different code hash are stale and removed on the next lookup."""
+
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+
+from collections import Counter
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    key TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    code TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_params ON runs (params);
+CREATE TABLE IF NOT EXISTS games (
+    key TEXT NOT NULL,
+    game INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (key, game)
+);
+'''
+
+def path(obj):
+    """dotted path of a class or module"""
+
+    return obj.__name__ if isinstance(obj, type(sys)) else '{}.{}'.format(
+        obj.__module__, obj.__qualname__)
+
+def code_hash(*objs):
+    """hash of the source files of regno and of the modules the objects are defined in"""
+
+    package = os.path.dirname(os.path.abspath(__file__))
+    files = set()
+    for root, _, names in os.walk(package):
+        files.update(os.path.join(root, name) for name in names if name.endswith('.py'))
+    for obj in objs:
+        module = obj if isinstance(obj, type(sys)) else sys.modules.get(obj.__module__)
+        if getattr(module, '__file__', None):
+            files.add(os.path.abspath(module.__file__))
+
+    digest = hashlib.sha256()
+    for file in sorted(files):
+        with open(file, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+class Cache(object):
+    """per game results of runs"""
+
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def key(self, strategies, module, cards=(), seed=None, **options):
+        """key of the run with the given setup under the current code, drops stale results"""
+
+        if isinstance(module, str):
+            from .utils import class_from_path
+            module = class_from_path(module)
+
+        params = json.dumps({
+            'strategies': [path(strategy) for strategy in strategies],
+            'module': path(module) if module else None,
+            'cards': sorted(path(card) for card in cards),
+            'seed': seed,
+            'options': options,
+        }, sort_keys=True)
+        code = code_hash(module, *(tuple(strategies) + tuple(cards)))
+        key = hashlib.sha256('{}\n{}'.format(params, code).encode('utf-8')).hexdigest()
+
+        with self.connection:
+            stale = [row[0] for row in self.connection.execute(
+                'SELECT key FROM runs WHERE params = ? AND code != ?', (params, code))]
+            if stale:
+                LOGGER.info('removing %d stale cached run(s)', len(stale))
+                self.connection.executemany('DELETE FROM games WHERE key = ?',
+                                            ((k,) for k in stale))
+                self.connection.executemany('DELETE FROM runs WHERE key = ?',
+                                            ((k,) for k in stale))
+            self.connection.execute('INSERT OR IGNORE INTO runs VALUES (?, ?, ?)',
+                                    (key, params, code))
+
+        return key
+
+    def load(self, key, start, games):
+        """game number -> summary for all cached games in range(start, start + games)"""
+
+        return {game: json.loads(summary) for game, summary in self.connection.execute(
+            'SELECT game, summary FROM games WHERE key = ? AND game >= ? AND game < ?',
+            (key, start, start + games))}
+
+    def store(self, key, summaries):
+        """stores the summaries of games, which know their number"""
+
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO games VALUES (?, ?, ?)',
+                ((key, summary['game'] - 1, json.dumps(summary, separators=(',', ':')))
+                 for summary in summaries))
+
+def _segments(cached, start, games):
+    """splits the range of games into (cached, start, number) runs of consecutive games"""
+
+    begin = start
+    for game in range(start, start + games + 1):
+        if game == start + games or (game in cached) != (begin in cached):
+            if game > begin:
+                yield begin in cached, begin, game - begin
+            begin = game
+
+def cached_run(cache, key, run, start=0, games=1):
+    """yields the results of the games like regno.runner.run, but only plays missing games
+
+    run(start, games) must return the results of the given games including summaries.
+    New results are stored in the cache as they come in."""
+
+    cached = cache.load(key, start, games)
+    LOGGER.info('%d of %d games found in the cache', len(cached), games)
+
+    for hit, begin, number in _segments(cached, start, games):
+        if hit:
+            summaries = [cached[game] for game in range(begin, begin + number)]
+            wins = Counter()
+            for summary in summaries:
+                wins.update(summary['winners'])
+            yield {'games': number, 'summaries': summaries, 'wins': wins, 'timings': None,
+                   'columns': None, 'trace': None,
+                   'truncated': sum('truncated' in summary for summary in summaries)}
+            continue
+
+        for result in run(begin, number):
+            cache.store(key, result['summaries'])
+            yield result
@@ -6,5 +6,5 @@ from __future__ import absolute_import
 
 from . import base, original
 
-from .base import BASESET
+from .base import BASESET, card_class
 from .utils import card_classes, random_set
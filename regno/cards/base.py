@@ -6,9 +6,26 @@ from __future__ import absolute_import, unicode_literals
 
 import logging
 
+from ..events import Buy, Play
+
 LOGGER = logging.getLogger(__name__)
 
+# card id -> card class, see Card.id
+REGISTRY = []
+
+def card_class(card_id):
+    """the card class with the given id"""
+
+    return REGISTRY[card_id]
+
 class Card(object):
+    def __init_subclass__(cls, **kwargs):
+        # small integer ids, assigned in order of definition, so they are only
+        # stable between processes that define the same cards
+        super().__init_subclass__(**kwargs)
+        cls.id = len(REGISTRY)
+        REGISTRY.append(cls)
+
     def __init__(self, player, game):
         self.player = player
         self.game = game
@@ -18,25 +35,38 @@ class Card(object):
 
     def play(self):
         self.player.in_play.append(self)
+        if self.game.hooks:
+            self.game.emit(Play, self.player, type(self))
+        self.player.money_in_play += self.money
         self.player.actions += self.actions
         self.player.buys += self.buys
-        for _ in range(self.cards):
-            self.player.draw_hand()
+        if self.cards:
+            self.player.draw_hand(self.cards)
 
-    def gain(self):
+    def gain(self, pile=None):
         self.game.supply[type(self)] -= 1
-        self.player.discard_pile.append(type(self))
-        LOGGER.info('player %s gained card %s', self.player, self)
+        self.player.gain(type(self), pile)
+        if self.game.verbose:
+            LOGGER.info('player %s gained card %s', self.player, self)
 
     def buy(self):
         self.player.spent_money += self.cost
-        LOGGER.info('player %s bought card %s', self.player, self)
+        if self.game.verbose:
+            LOGGER.info('player %s bought card %s', self.player, self)
+        if self.game.hooks:
+            self.game.emit(Buy, self.player, type(self))
         self.gain()
 
     @property
     def name(self):
         return type(self).__name__
 
+    # set on the second play of a card played twice, e.g., by Throne Room
+    copy = False
+
+    # all of the following are class attributes and can be read straight from
+    # the card class, except for cost, which cards may compute in a property;
+    # use game.card(cls).cost to read it without creating a new card
     text = None
     types = frozenset()
 
@@ -5,8 +5,8 @@
 from __future__ import absolute_import, division, unicode_literals
 
 import logging
-import random
 
+from ..events import Lose, Trash
 from .base import Card, Copper, Curse, Gold, Silver
 
 LOGGER = logging.getLogger(__name__)
@@ -29,7 +29,8 @@ class Adventurer(Card):
                 LOGGER.warning('deck and discard pile are empty, no more cards to draw')
                 break
 
-            LOGGER.info('Adventurer revealed %s', card.__name__)
+            if self.game.verbose:
+                LOGGER.info('Adventurer revealed %s', card.__name__)
 
             if 'treasure' in card.types:
                 treasures.append(card)
@@ -37,7 +38,7 @@ class Adventurer(Card):
                 others.append(card)
 
         self.player.hand.extend(treasures)
-        self.player.discard_pile.extend(treasures)
+        self.player.discard_pile.extend(others)
 
 class Cellar(Card):
     def __init__(self, player, game, to_discard=()):
@@ -74,7 +75,7 @@ class Chancellor(Card):
 
         if self.discard_deck:
             self.player.discard_pile.extend(self.player.deck)
-            self.player.deck = []
+            self.player.deck.clear()
 
 class Chapel(Card):
     def __init__(self, player, game, to_trash=()):
@@ -91,8 +92,7 @@ class Chapel(Card):
         super().play()
 
         for card in self.to_trash:
-            self.player.hand.remove(card)
-            self.game.trash.append(card)
+            self.player.trash(card)
 
 class CouncilRoom(Card):
     types = frozenset(['action'])
@@ -102,6 +102,8 @@ class CouncilRoom(Card):
     cards = 4
 
     def play(self):
+        super().play()
+
         for player in self.game.players:
             if player is not self.player:
                 player.draw_hand()
@@ -126,12 +128,17 @@ class Feast(Card):
     def play(self):
         super().play()
         self.player.in_play.pop()
-        self.game.trash.append(type(self))
 
-        if self.to_gain and self.game.supply.get(self.to_gain):
-            card = self.to_gain(self.player, self.game)
-            if card.cost <= 5:
-                card.gain()
+        # a Feast played twice by Throne Room is still only trashed once
+        if not self.copy:
+            self.game.trash.append(type(self))
+            self.player.lose(type(self))
+            if self.game.hooks:
+                self.game.emit(Trash, self.player, type(self))
+
+        if (self.to_gain and self.game.supply.get(self.to_gain)
+                and self.game.card(self.to_gain).cost <= 5):
+            self.to_gain(self.player, self.game).gain()
 
 class Gardens(Card):
     types = frozenset(['victory'])
@@ -175,35 +182,29 @@ class Mine(Card):
 
         if not self.to_trash:
             treasures = [card for card in self.player.hand
-                         if 'treasure' in card.types and card(self.player, self.game).cost < 6]
+                         if 'treasure' in card.types and self.game.card(card).cost < 6]
 
             if not treasures:
                 return
 
-            random.shuffle(treasures)
+            self.game.random.shuffle(treasures)
             self.to_trash = treasures[0]
 
-        self.player.hand.remove(self.to_trash)
-        self.game.trash.append(self.to_trash)
+        self.player.trash(self.to_trash)
 
-        LOGGER.info('trashed %s', self.to_trash.__name__)
+        if self.game.verbose:
+            LOGGER.info('trashed %s', self.to_trash.__name__)
 
-        money = self.to_trash(self.player, self.game).cost + 3
+        money = self.game.card(self.to_trash).cost + 3
 
-        gainable = [x[0] for x in self.game.supply.items()
-                    if x[1] > 0 and 'treasure' in x[0].types
-                    and x[0](self.player, self.game).cost <= money]
+        # the most expensive treasure, among to_gain if given
+        gained = next((card for cards in self.game.supply.costing(money, 'treasure')
+                       for card in cards if not self.to_gain or card in self.to_gain), None)
 
-        if self.to_gain:
-            gainable = [card for card in gainable if card in self.to_gain]
-
-        gainable = sorted(gainable, key=lambda x: -x(self.player, self.game).cost)
-
-        if gainable:
-            gainable[0](self.player, self.game).gain()
-            gained = self.player.discard_pile.pop()
-            self.player.hand.append(gained)
-            LOGGER.info('gained %s', gained.__name__)
+        if gained is not None:
+            gained(self.player, self.game).gain(self.player.hand)
+            if self.game.verbose:
+                LOGGER.info('gained %s', gained.__name__)
 
 class Moneylender(Card):
     types = frozenset(['action'])
@@ -211,14 +212,12 @@ class Moneylender(Card):
     supply = 10
 
     def play(self):
-        try:
-            self.player.hand.remove(Copper)
-        except ValueError:
+        if Copper in self.player.hand:
+            self.player.trash(Copper)
+            self.money = 3
+        elif self.game.verbose:
             LOGGER.info('no Copper to trash')
-            return
 
-        self.game.trash.append(Copper)
-        self.money = 3
         super().play()
 
 class Remodel(Card):
@@ -239,23 +238,19 @@ class Remodel(Card):
         if not self.to_trash:
             if not self.player.hand:
                 return
-            self.to_trash = random.choice(self.player.hand)
+            self.to_trash = self.game.random.choice(self.player.hand)
 
-        self.player.hand.remove(self.to_trash)
-        self.game.trash.append(self.to_trash)
-        money = self.to_trash(self.player, self.game).cost + 2
+        self.player.trash(self.to_trash)
+        money = self.game.card(self.to_trash).cost + 2
 
         candidates = list(self.to_gain)
 
         if not candidates:
-            candidates = [card for card, stack in self.game.supply.items()
-                          if stack and card(self.player, self.game).cost <= money]
-            candidates = sorted(candidates, key=lambda card: -card(self.player, self.game).cost)
+            candidates = self.game.supply.most_expensive(money)
 
         for candidate in candidates:
-            card = candidate(self.player, self.game)
-            if card.cost <= money and self.game.supply.get(candidate):
-                card.gain()
+            if self.game.card(candidate).cost <= money and self.game.supply.get(candidate):
+                candidate(self.player, self.game).gain()
                 return
 
 class Smithy(Card):
@@ -281,8 +276,9 @@ class Thief(Card):
             if player is self.player:
                 continue
 
-            cards = list(filter(None, (player.draw(), player.draw())))
-            LOGGER.info('Player %s reveals cards %s', player, cards)
+            cards = player.draw_many(2)
+            if self.game.verbose:
+                LOGGER.info('Player %s reveals cards %s', player, cards)
 
             for target in self.to_trash:
                 try:
@@ -293,19 +289,26 @@ class Thief(Card):
             else:
                 treasures = [card for card in cards if 'treasure' in card.types]
                 if treasures:
-                    random.shuffle(treasures)
+                    self.game.random.shuffle(treasures)
                     target = treasures[0]
                     cards.remove(target)
                 else:
                     target = None
 
             if target:
+                player.lose(target)
                 if target in self.to_gain:
-                    LOGGER.info('Thief steals card %s', target.__name__)
-                    self.player.discard_pile.append(target)
+                    if self.game.verbose:
+                        LOGGER.info('Thief steals card %s', target.__name__)
+                    if self.game.hooks:
+                        self.game.emit(Lose, player, target)
+                    self.player.gain(target)
                 else:
-                    LOGGER.info('Thief trashes card %s', target.__name__)
+                    if self.game.verbose:
+                        LOGGER.info('Thief trashes card %s', target.__name__)
                     self.game.trash.append(target)
+                    if self.game.hooks:
+                        self.game.emit(Trash, player, target)
 
             player.discard_pile.extend(cards)
 
@@ -329,20 +332,26 @@ class ThroneRoom(Card):
             if not actions:
                 return
 
-            random.shuffle(actions)
+            self.game.random.shuffle(actions)
 
             self.to_play = actions[0]
 
-            LOGGER.info('selected random action card %s', self.to_play.__name__)
+            if self.game.verbose:
+                LOGGER.info('selected random action card %s', self.to_play.__name__)
 
         self.player.hand.remove(self.to_play)
 
-        LOGGER.info('Throne Room plays action card %s twice', self.to_play.__name__)
+        if self.game.verbose:
+            LOGGER.info('Throne Room plays action card %s twice', self.to_play.__name__)
 
         self.to_play(self.player, self.game, **self.kwargs1).play()
-        self.to_play(self.player, self.game, **self.kwargs2).play()
+        second = self.to_play(self.player, self.game, **self.kwargs2)
+        second.copy = True
+        second.play()
 
-        self.player.in_play.pop()
+        # only one physical card is in play
+        if second in self.player.in_play:
+            self.player.in_play.remove(second)
 
 class Village(Card):
     types = frozenset(['action'])
@@ -393,12 +402,9 @@ class Workshop(Card):
         candidates = list(self.to_gain) if self.to_gain else ()
 
         if not candidates:
-            candidates = [card for card, stack in self.game.supply.items()
-                          if stack and card(self.player, self.game).cost <= 4]
-            candidates = sorted(candidates, key=lambda card: -card(self.player, self.game).cost)
+            candidates = self.game.supply.most_expensive(4)
 
         for candidate in candidates:
-            card = candidate(self.player, self.game)
-            if card.cost <= 4 and self.game.supply.get(candidate):
-                card.gain()
+            if self.game.card(candidate).cost <= 4 and self.game.supply.get(candidate):
+                candidate(self.player, self.game).gain()
                 return
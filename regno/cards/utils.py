@@ -19,8 +19,10 @@ def card_classes(module):
         except TypeError:
             pass
 
-def random_set(module=None, cards=None, num=10, base=BASESET):
-    """creates a set of num cards from the module, with the given cards included, and base added"""
+def random_set(module=None, cards=None, num=10, base=BASESET, rng=None):
+    """creates a set of num cards from the module, with the given cards included, and base added
+
+    Pass a random.Random instance as rng for a reproducible choice of cards."""
 
     cards = list(cards) if cards is not None else []
     remaining = num - len(cards)
@@ -29,7 +31,7 @@ def random_set(module=None, cards=None, num=10, base=BASESET):
         avail_cards = list(card_classes(module))
         if cards:
             avail_cards = [card for card in avail_cards if card not in cards]
-        random.shuffle(avail_cards)
+        (rng or random).shuffle(avail_cards)
 
         cards += avail_cards[:remaining]
 
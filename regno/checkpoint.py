@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""checkpoints of long runs, to resume them after they were interrupted
+
+A checkpoint holds the setup of the run including its seed, the number of the next game
+and everything aggregated over the games played so far. Every game is seeded on its own
+(see regno.runner.game_seed), so that is all it takes to carry on where the run stopped.
+Checkpoints are written to a temporary file that then replaces the previous one, so a run
+killed while writing leaves the last checkpoint intact."""
+
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import tempfile
+import time
+
+def save(path, state):
+    """atomically replaces the checkpoint at path with the state"""
+
+    directory, name = os.path.split(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(prefix='.' + name, suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(state, file, separators=(',', ':'))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+def load(path):
+    """the state stored in the checkpoint at path"""
+
+    with open(path) as file:
+        return json.load(file)
+
+class Checkpoint(object):
+    """saves the state of a run at most once per interval"""
+
+    def __init__(self, path, interval=60.):
+        self.path = path
+        self.interval = interval
+        self.last = time.monotonic()
+
+    def due(self):
+        return time.monotonic() - self.last >= self.interval
+
+    def save(self, state):
+        save(self.path, state)
+        self.last = time.monotonic()
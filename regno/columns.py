@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""columnar game results with one row per game and seat
+
+Every row holds the number of the game, its seed, the seat, the strategy, its victory
+points and rank, whether it won, the number of turns of the game, whether the game was
+truncated and the number of cards of every kind in the final deck. The columns are
+fixed for a run (see fields), so chunks of rows from worker processes are simply
+appended to a CSV or NPZ file. Rows are taken from the finished games directly,
+without building their summaries.
+
+NPZ files are written in shards of at most SHARD rows, each stored as one array per
+column named <column>.<first row>, so memory does not grow with the number of games.
+Read them with load, which joins the shards of every column. NPZ files require NumPy."""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import csv
+import os
+import zipfile
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .cards import BASESET, card_classes
+
+# maximum number of rows kept in memory before they are written to an NPZ file
+SHARD = 100000
+
+# columns before the card counts
+COLUMNS = ('game', 'seed', 'seat', 'strategy', 'victory_points', 'rank', 'winner', 'turns',
+           'truncated')
+
+def card_names(module=None, cards=()):
+    """names of all cards that can appear in the games, in the order of their columns"""
+
+    names = {card.__name__ for card in BASESET}
+    names.update(card.__name__ for card in cards)
+    if module is not None:
+        names.update(card.__name__ for card in card_classes(module))
+    return sorted(names)
+
+def fields(cards):
+    """all column names, cards are counted in the columns deck_<name>"""
+
+    return COLUMNS + tuple('deck_' + name for name in cards)
+
+class Columns(object):
+    """rows of game results stored as one array (or list of strings) per column"""
+
+    def __init__(self, cards):
+        self.cards = tuple(cards)
+        self.index = {name: i for i, name in enumerate(self.cards)}
+        self.data = {name: array('q') for name in fields(self.cards)}
+        self.data['strategy'] = []
+
+    def __len__(self):
+        return len(self.data['game'])
+
+    def _add(self, game, seed, seat, strategy, points, max_points, ranks, turns, truncated,
+             deck):
+        data = self.data
+        data['game'].append(game)
+        # seeds are non-negative, -1 marks games without one
+        data['seed'].append(-1 if seed is None else seed)
+        data['seat'].append(seat)
+        data['strategy'].append(strategy)
+        data['victory_points'].append(points)
+        data['rank'].append(1 + ranks)
+        # truncated games have no winner
+        data['winner'].append(points == max_points and not truncated)
+        data['turns'].append(turns)
+        data['truncated'].append(bool(truncated))
+        counts = [0] * len(self.cards)
+        for name, count in deck:
+            counts[self.index[name]] = count
+        for name, count in zip(self.cards, counts):
+            data['deck_' + name].append(count)
+
+    def add(self, game, number, seed=None):
+        """adds the rows of a finished game"""
+
+        points = [player.victory_points for player in game.players]
+        max_points = max(points)
+        for seat, player in enumerate(game.players):
+            self._add(number, seed, seat + 1, type(player.strategy).__name__, points[seat],
+                      max_points, sum(other > points[seat] for other in points), game.turns,
+                      game.truncated,
+                      ((card.__name__, count) for card, count in player.counter.items()))
+
+    def add_summary(self, summary):
+        """adds the rows of a game summary, e.g., from the cache or the batch engine"""
+
+        players = summary['players']
+        points = [player['victory_points'] for player in players]
+        turns = ((summary['current_round'] - 1) * len(players)
+                 + summary['current_player'] - 1)
+        for player in players:
+            self._add(summary['game'], summary.get('seed'), player['number'],
+                      player['strategy'], player['victory_points'], summary['max_points'],
+                      sum(other > player['victory_points'] for other in points), turns,
+                      summary.get('truncated'), player['deck'].items())
+
+    def extend(self, data):
+        """appends the rows of another Columns' data"""
+
+        for name, values in data.items():
+            self.data[name].extend(values)
+
+    def rows(self):
+        return zip(*(self.data[name] for name in fields(self.cards)))
+
+class CSVWriter(object):
+    """appends rows to a CSV file with a header line"""
+
+    def __init__(self, path, cards, position=None):
+        self.file = open(path, 'r+' if position is not None else 'w', newline='')
+        self.writer = csv.writer(self.file)
+        if position is None:
+            self.writer.writerow(fields(cards))
+        else:
+            # drop rows written after the checkpoint the run resumes from
+            self.file.seek(position)
+            self.file.truncate()
+
+    def write(self, columns):
+        self.writer.writerows(columns.rows())
+
+    def position(self):
+        """where the rows written so far end, to resume writing there"""
+
+        self.file.flush()
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+def _shards(archive):
+    """(column, first row, member name) of every shard in the NPZ archive"""
+
+    for member in archive.namelist():
+        name, start = member[:-len('.npy')].rsplit('.', 1)
+        yield name, int(start), member
+
+class NPZWriter(object):
+    """appends the rows in shards of compressed NumPy arrays, one per column"""
+
+    def __init__(self, path, cards, position=None):
+        if np is None:
+            raise RuntimeError('writing NPZ files requires NumPy')
+
+        self.path = path
+        self.cards = tuple(cards)
+        self.columns = Columns(self.cards)
+        self.rows = position or 0
+        # drop shards written after the checkpoint the run resumes from
+        temporary = self.path + '.tmp'
+        with zipfile.ZipFile(temporary, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as target:
+            if position:
+                with zipfile.ZipFile(path) as source:
+                    for _, start, member in _shards(source):
+                        if start < position:
+                            target.writestr(source.getinfo(member), source.read(member))
+        os.replace(temporary, self.path)
+
+    def write(self, columns):
+        self.columns.extend(columns.data)
+        if len(self.columns) >= SHARD:
+            self.flush()
+
+    def flush(self):
+        """appends the rows kept in memory as a new shard"""
+
+        if not len(self.columns):
+            return
+        with zipfile.ZipFile(self.path, 'a', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            for name, values in self.columns.data.items():
+                array = np.array(values, dtype=str if name == 'strategy' else None)
+                with archive.open('{}.{}.npy'.format(name, self.rows), 'w',
+                                  force_zip64=True) as file:
+                    np.lib.format.write_array(file, array, allow_pickle=False)
+        self.rows += len(self.columns)
+        self.columns = Columns(self.cards)
+
+    def position(self):
+        """writes the rows so far and returns their number"""
+
+        self.flush()
+        return self.rows
+
+    def close(self):
+        self.flush()
+
+def load(path):
+    """the columns of an NPZ file as a dict of arrays, with the shards joined"""
+
+    if np is None:
+        raise RuntimeError('reading NPZ files requires NumPy')
+
+    shards = {}
+    with zipfile.ZipFile(path) as archive:
+        for name, start, member in sorted(_shards(archive), key=lambda shard: shard[1]):
+            with archive.open(member) as file:
+                shards.setdefault(name, []).append(np.lib.format.read_array(file))
+    return {name: np.concatenate(arrays) for name, arrays in shards.items()}
+
+def writer(path, cards, position=None):
+    """a writer for the file type of path, resuming at position if given"""
+
+    if path.endswith('.csv'):
+        return CSVWriter(path, cards, position)
+    if path.endswith('.npz'):
+        return NPZWriter(path, cards, position)
+    raise ValueError('unsupported output file {}, use .csv or .npz'.format(path))
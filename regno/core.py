@@ -7,19 +7,171 @@ from __future__ import absolute_import, unicode_literals
 import logging
 import random
 
-from collections import Counter
+from collections import Counter, deque
+from itertools import chain
 
-from .cards.base import Copper, Estate, Province
+from .cards.base import Card, Copper, Estate, Province
+from .events import Gain, GameEnd, Shuffle, Trash, TurnStart
 
 LOGGER = logging.getLogger(__name__)
 
+class Supply(dict):
+    """maps card classes to the number of cards left in their pile
+
+    Keeps count of the empty piles as they run out (or get refilled), no matter
+    which dict method changes them, so the game end is checked in O(1). Likewise,
+    the piles that are not empty are kept ranked by cost, see costing. Cards that
+    override cost are ranked whenever they are looked up, with the cost function
+    (Game.cost in a game), since their cost may change during the game."""
+
+    def __init__(self, piles=(), cost=None):
+        super().__init__()
+        self.empty = 0
+        self.cost = cost or (lambda card: card(None, None).cost)
+        # available cards with a fixed cost, the most expensive first, then in supply order
+        self._available = []
+        # available cards that override cost, in supply order
+        self._dynamic = []
+        self.update(piles)
+
+    def __setitem__(self, card, count):
+        present = card in self
+        old = dict.__getitem__(self, card) if present else None
+        self.empty += (not count) - (present and not old)
+        dict.__setitem__(self, card, count)
+        if count and not old:
+            self._rank(card, present)
+        elif old and not count:
+            self._unrank(card)
+
+    def __delitem__(self, card):
+        count = self[card]
+        self.empty -= not count
+        if count:
+            self._unrank(card)
+        dict.__delitem__(self, card)
+
+    def update(self, *args, **kwargs):
+        for card, count in dict(*args, **kwargs).items():
+            self[card] = count
+
+    def setdefault(self, card, count=None):
+        if card not in self:
+            self[card] = count
+        return self[card]
+
+    def pop(self, card, *default):
+        if card in self:
+            count = self[card]
+            self.empty -= not count
+            if count:
+                self._unrank(card)
+        return dict.pop(self, card, *default)
+
+    def popitem(self):
+        card, count = dict.popitem(self)
+        self.empty -= not count
+        if count:
+            self._unrank(card)
+        return card, count
+
+    def clear(self):
+        dict.clear(self)
+        self.empty = 0
+        self._available = []
+        self._dynamic = []
+
+    def copy(self):
+        supply = type(self).__new__(type(self))
+        dict.update(supply, self)
+        supply.empty = self.empty
+        supply.cost = self.cost
+        supply._available = list(self._available)
+        supply._dynamic = list(self._dynamic)
+        return supply
+
+    def _rank(self, card, refilled):
+        cards = self._available if card.cost is Card.cost else self._dynamic
+        if refilled:
+            # the pile goes back to its place in the supply
+            order = {other: i for i, other in enumerate(self)}
+            cards.append(card)
+            if cards is self._available:
+                cards.sort(key=lambda other: (-other._cost, order[other]))
+            else:
+                cards.sort(key=order.__getitem__)
+        elif cards is self._dynamic:
+            cards.append(card)
+        else:
+            # a new pile comes last in the supply, so after all cards of the same cost
+            i = 0
+            while i < len(cards) and cards[i]._cost >= card._cost:
+                i += 1
+            cards.insert(i, card)
+
+    def _unrank(self, card):
+        (self._available if card.cost is Card.cost else self._dynamic).remove(card)
+
+    def costing(self, max_cost, kind=None):
+        """yields lists of the available cards (of the type) costing at most max_cost
+
+        Every list holds the cards of one cost in supply order, the most expensive
+        first. Do not change the supply while going through them."""
+
+        if self._dynamic:
+            costs = {card: self.cost(card) for card in chain(self._available, self._dynamic)}
+            order = {card: i for i, card in enumerate(self)}
+            ranked = sorted(costs, key=lambda card: (-costs[card], order[card]))
+        else:
+            costs = None
+            ranked = self._available
+
+        cards, level = [], None
+        for card in ranked:
+            cost = card._cost if costs is None else costs[card]
+            if cost > max_cost or kind is not None and kind not in card.types:
+                continue
+            if cost != level:
+                if cards:
+                    yield cards
+                cards, level = [], cost
+            cards.append(card)
+        if cards:
+            yield cards
+
+    def most_expensive(self, max_cost, kind=None):
+        """the available cards (of the type) of the highest cost up to max_cost"""
+
+        return next(self.costing(max_cost, kind), [])
+
 class Game(object):
     """game class"""
 
-    def __init__(self, supply, strategies):
-        self.supply = {card: card.supply for card in supply}
+    # the game ends when the Provinces or this many supply piles are gone
+    empty_piles = 3
+
+    def __init__(self, supply, strategies, seed=None, verbose=None, hooks=None,
+                 shuffle_seats=True, max_turns=10000, stall_rounds=None):
+        # every source of randomness in a game goes through its own generator,
+        # so a game is fully determined by its seed
+        self.random = seed if isinstance(seed, random.Random) else random.Random(seed)
+
+        # all INFO logging is skipped unless it is enabled when the game is created,
+        # so neither the messages nor their arguments cost anything otherwise
+        self.verbose = (logging.getLogger('regno').isEnabledFor(logging.INFO)
+                        if verbose is None else verbose)
+        # event class -> list of callbacks, see regno.events
+        self.hooks = {}
+        for event, callbacks in (hooks or {}).items():
+            for callback in callbacks:
+                self.subscribe(event, callback)
+
+        # card class -> flyweight, see card
+        self._cards = {}
+        self.supply = Supply(((card, card.supply) for card in supply), cost=self.cost)
         strategies = list(strategies)
-        random.shuffle(strategies)
+        if shuffle_seats:
+            self.random.shuffle(strategies)
         self.players = [Player('Player #{}'.format(i + 1), self, strategy)
                         for i, strategy in enumerate(strategies)]
 
@@ -27,8 +179,24 @@ class Game(object):
         self.current_player = 0
         self.trash = []
 
+        # games that run too long are cut short, truncated tells why
+        self.max_turns = max_turns
+        self.stall_rounds = stall_rounds
+        self.truncated = None
+        self._supply_left = sum(self.supply.values())
+        self._progress_round = 0
+
+        self._stats = None
+
     @property
     def stats(self):
+        """summary of the game, computed once when the game is over
+
+        Truncated games have no winners, but the reason they were cut short."""
+
+        if self._stats is not None:
+            return self._stats
+
         max_points = max(player.victory_points for player in self.players)
         result = {
             'cards': sorted(card.__name__ for card in self.supply),
@@ -44,32 +212,142 @@ class Game(object):
             'current_round': self.current_round + 1,
             'current_player': self.current_player + 1,
         }
-        if self.finished():
+        if self.truncated:
+            result['winners'] = []
+            result['truncated'] = self.truncated
+            self._stats = result
+        elif self.finished():
             result['winners'] = [player['strategy']
                                  for player in result['players']
                                  if player['leading']]
+            self._stats = result
 
         return result
 
+    def winners(self):
+        """names of the strategies of the players with the most points, without the stats"""
+
+        if self.truncated:
+            return []
+        points = [player.victory_points for player in self.players]
+        max_points = max(points)
+        return [type(player.strategy).__name__
+                for player, player_points in zip(self.players, points)
+                if player_points == max_points]
+
+    def snapshot(self):
+        """the state of the game in between two steps, to be passed to restore
+
+        Captures the supply, the trash, the turn position, the state of the random
+        generator and the piles and counters of every player. Card classes and the
+        strategies are shared, only the containers are copied."""
+
+        return (self.supply.copy(), list(self.trash), self.current_round, self.current_player,
+                self.random.getstate(), [player.snapshot() for player in self.players],
+                self.truncated, self._supply_left, self._progress_round)
+
+    def restore(self, state):
+        """puts the game back into the state of the snapshot, which can be restored again"""
+
+        (supply, trash, self.current_round, self.current_player, random_state, players,
+         self.truncated, self._supply_left, self._progress_round) = state
+        self._stats = None
+        self.supply = supply.copy()
+        self.supply.cost = self.cost
+        self.trash = list(trash)
+        self.random.setstate(random_state)
+        for player, player_state in zip(self.players, players):
+            player.restore(player_state)
+
+    def clone(self):
+        """an independent copy of the game with the same strategies, e.g., for lookahead
+
+        The clone has neither hooks nor timed methods (see regno.instrument), so trying
+        out moves does not show up in the events or timings of the original game."""
+
+        state = self.snapshot()
+        game = object.__new__(type(self))
+        game.__dict__.update((name, value) for name, value in self.__dict__.items()
+                             if not callable(value))
+        game.random = random.Random()
+        game.hooks = {}
+        game._cards = {}
+        game.players = []
+        for player in self.players:
+            clone = object.__new__(type(player))
+            clone.__dict__.update(player.__dict__)
+            clone.game = game
+            game.players.append(clone)
+        game.restore(state)
+        return game
+
+    def card(self, card):
+        """a shared, player-less instance of the card class for reading its attributes
+
+        Use it to compare costs and the like without allocating a new card every time.
+        Cards that override cost must therefore only depend on the game, not the player."""
+
+        try:
+            return self._cards[card]
+        except KeyError:
+            instance = self._cards[card] = card(None, self)
+            return instance
+
+    def cost(self, card):
+        """the cost of the card class in this game"""
+
+        return self.card(card).cost
+
+    def subscribe(self, event, callback):
+        """calls callback with an instance of the event class every time it happens"""
+
+        self.hooks.setdefault(event, []).append(callback)
+
+    def emit(self, event, *args):
+        """creates the event and passes it to the subscribers
+
+        Call sites check game.hooks first, so events nobody subscribed to cost
+        a dict lookup at most."""
+
+        callbacks = self.hooks.get(event)
+        if callbacks:
+            event = event(self, *args)
+            for callback in callbacks:
+                callback(event)
+
     def finished(self):
-        return self.supply[Province] == 0 or sum(pile == 0 for pile in self.supply.values()) >= 3
+        return self.supply.get(Province) == 0 or self.supply.empty >= self.empty_piles
 
     def play(self):
         while not self.finished():
             player = self.players[self.current_player]
-            LOGGER.info('#######################################################')
-            LOGGER.info('play round #%d player #%d (%s)',
-                        self.current_round + 1, self.current_player + 1,
-                        type(player.strategy).__name__)
+            if self.verbose:
+                LOGGER.info('#######################################################')
+                LOGGER.info('play round #%d player #%d (%s)',
+                            self.current_round + 1, self.current_player + 1,
+                            type(player.strategy).__name__)
             self.play_round(player)
-            self.current_player += 1
-
-            if self.current_player >= len(self.players):
-                self.current_player = 0
-                self.current_round += 1
+            self.next_turn()
 
             # LOGGER.info(self.supply)
 
+            # a game that just ended on its own is not cut short
+            if self.finished():
+                break
+            if self.max_turns is not None and self.turns >= self.max_turns:
+                self.truncated = 'max_turns'
+            elif self.stall_rounds and not self.current_player and self.stalled():
+                self.truncated = 'stalled'
+            if self.truncated:
+                LOGGER.warning('game cut short after %d turns (%s)', self.turns, self.truncated)
+                break
+
+        if self.hooks:
+            self.emit(GameEnd)
+
+        if not self.verbose:
+            return
+
         max_points = max(player.victory_points for player in self.players)
         for i, player in enumerate(self.players):
             LOGGER.info('#%d Player: %d victory points with strategy %s',
@@ -77,58 +355,97 @@ class Game(object):
             if player.victory_points == max_points:
                 LOGGER.info('Player #%d has won!', i + 1)
 
+    @property
+    def turns(self):
+        """number of turns played so far"""
+
+        return self.current_round * len(self.players) + self.current_player
+
+    def stalled(self):
+        """whether the supply has not changed for stall_rounds rounds, checked once per round"""
+
+        left = sum(self.supply.values())
+        if left != self._supply_left:
+            self._supply_left = left
+            self._progress_round = self.current_round
+        return self.current_round - self._progress_round >= self.stall_rounds
+
+    def next_turn(self):
+        """moves on to the next player, and to the next round after the last player"""
+
+        self.current_player += 1
+        if self.current_player >= len(self.players):
+            self.current_player = 0
+            self.current_round += 1
+
     def play_round(self, player):
-        LOGGER.info('hand: [%s]', ', '.join(card(player, self).name for card in player.hand))
+        if self.hooks:
+            self.emit(TurnStart, player)
+        if self.verbose:
+            LOGGER.info('hand: [%s]', ', '.join(card.__name__ for card in player.hand))
 
         player.actions = 1
         player.buys = 1
+        player.money_in_play = 0
         player.spent_money = 0
 
+        self.action_phase(player)
+        self.treasure_phase(player)
+        self.buy_phase(player)
+        self.cleanup_phase(player)
+
+        if self.verbose:
+            LOGGER.info('player is done with the turn – next one')
+
+    def play_card(self, card):
+        """plays a card from the hand in the action or treasure phase"""
+
+        card.play()
+
+    def action_phase(self, player):
         while player.actions > 0:
             card = player.strategy.action(player, self)
             if card is None:
-                LOGGER.info('no more actions to play')
+                if self.verbose:
+                    LOGGER.info('no more actions to play')
                 break
 
             player.hand.remove(type(card))
             player.actions -= 1
-            LOGGER.info('playing action %s', card.name)
-            card.play()
+            if self.verbose:
+                LOGGER.info('playing action %s', card.name)
+            self.play_card(card)
 
+    def treasure_phase(self, player):
         while len(player.hand) > 0:
             card = player.strategy.treasure(player, self)
             if card is None:
-                LOGGER.info('no more treasures to play')
+                if self.verbose:
+                    LOGGER.info('no more treasures to play')
                 break
 
             player.hand.remove(type(card))
 
-            LOGGER.info('playing treasure %s', card.name)
-            card.play()
+            if self.verbose:
+                LOGGER.info('playing treasure %s', card.name)
+            self.play_card(card)
 
+    def buy_phase(self, player):
         while player.buys > 0:
             card = player.strategy.buy(player, self)
             if card is None:
-                LOGGER.info('no more cards to buy')
+                if self.verbose:
+                    LOGGER.info('no more cards to buy')
                 break
 
             player.buys -= 1
 
-            LOGGER.info('buying card %s', card.name)
+            if self.verbose:
+                LOGGER.info('buying card %s', card.name)
             card.buy()
 
-        player.discard_pile.extend(player.hand)
-        player.discard_pile.extend(type(card) for card in player.in_play)
-        player.hand = []
-        for _ in range(5):
-            player.draw_hand()
-        player.in_play = []
-
-        player.actions = 1
-        player.buys = 1
-        player.spent_money = 0
-
-        LOGGER.info('player is done with the turn – next one')
+    def cleanup_phase(self, player):
+        player.cleanup()
 
 class Player(object):
     """player class"""
@@ -137,16 +454,29 @@ class Player(object):
         self.name = name
         self.game = game
         self.strategy = strategy
-        self.deck = [Copper] * 7 + [Estate] * 3
+        # the top of the deck is on the left, so drawing is an O(1) popleft
+        cards = [Copper] * 7 + [Estate] * 3
+        game.random.shuffle(cards)
+        self.deck = deque(cards)
         self.discard_pile = []
-        random.shuffle(self.deck)
+
+        # running totals over all cards the player owns, kept up to date by
+        # gain, trash and lose, so reading them never scans the deck
+        self.counter = Counter()
+        self.cards_total = 0
+        self._fixed_points = 0
+        self._variable_points = set()
+        for card in cards:
+            self._add(card)
 
         self.hand = []
         self.in_play = []
 
-        for _ in range(5):
-            self.draw_hand()
+        self.draw_hand(5)
 
+        self.actions = 1
+        self.buys = 1
+        self.money_in_play = 0
         self.spent_money = 0
 
     def __str__(self):
@@ -154,50 +484,153 @@ class Player(object):
 
     @property
     def victory_points(self):
-        return sum(card.victory_points for card in self.full_deck)
+        points = self._fixed_points
+        for card in self._variable_points:
+            points += card(self, self.game).victory_points * self.counter[card]
+        return points
 
     @property
     def money(self):
-        return sum(card.money for card in self.in_play) - self.spent_money
-
-    @property
-    def cards_total(self):
-        return len(self.deck) + len(self.hand) + len(self.in_play) + len(self.discard_pile)
+        return self.money_in_play - self.spent_money
 
     @property
     def full_deck(self):
-        return (tuple(card(self, self.game) for card in self.deck + self.hand + self.discard_pile)
+        return (tuple(card(self, self.game)
+                      for card in chain(self.deck, self.hand, self.discard_pile))
                 + tuple(self.in_play))
 
-    @property
-    def counter(self):
-        return Counter(type(card) for card in self.full_deck)
+    def snapshot(self):
+        """the state of the player's piles and counters, see Game.snapshot"""
+
+        return (tuple(self.deck), self.hand.copy(), self.discard_pile.copy(),
+                [_copy_card(card, self) for card in self.in_play], self.counter.copy(),
+                self.cards_total, self._fixed_points, set(self._variable_points),
+                self.actions, self.buys, self.money_in_play, self.spent_money)
+
+    def restore(self, state):
+        """puts the player back into the state of the snapshot, see Game.restore"""
+
+        (deck, hand, discard_pile, in_play, counter, self.cards_total, self._fixed_points,
+         variable_points, self.actions, self.buys, self.money_in_play, self.spent_money) = state
+        self.deck = deque(deck)
+        self.hand = hand.copy()
+        self.discard_pile = discard_pile.copy()
+        # cards in play keep what they chose when played, but belong to this player
+        self.in_play = [_copy_card(card, self) for card in in_play]
+        self.counter = counter.copy()
+        self._variable_points = set(variable_points)
+
+    def _add(self, card):
+        self.counter[card] += 1
+        self.cards_total += 1
+        if isinstance(card.victory_points, property):
+            # points depend on the state of the game, e.g., Gardens
+            self._variable_points.add(card)
+        else:
+            self._fixed_points += card.victory_points
 
-    def draw(self):
-        try:
-            return self.deck.pop(0)
-        except IndexError:
+    def lose(self, card):
+        """bookkeeping for a card that left the player's possession, e.g., trashed or stolen"""
+
+        self.counter[card] -= 1
+        if not self.counter[card]:
+            del self.counter[card]
+            self._variable_points.discard(card)
+        self.cards_total -= 1
+        if not isinstance(card.victory_points, property):
+            self._fixed_points -= card.victory_points
+
+    def gain(self, card, pile=None):
+        """puts the card on the discard pile or the given pile, without touching the supply"""
+
+        (self.discard_pile if pile is None else pile).append(card)
+        self._add(card)
+        if self.game.hooks:
+            self.game.emit(Gain, self, card)
+
+    def trash(self, card):
+        """trashes the card from the hand"""
+
+        self.hand.remove(card)
+        self.game.trash.append(card)
+        self.lose(card)
+        if self.game.hooks:
+            self.game.emit(Trash, self, card)
+
+    def shuffle(self):
+        """shuffles the discard pile and puts it under the (usually empty) deck"""
+
+        if self.game.verbose:
             LOGGER.info('empty deck – have to shuffle discard pile')
-            self.deck = self.discard_pile
-            self.discard_pile = []
-            random.shuffle(self.deck)
-            return self.draw() if len(self.deck) else None
-
-    def draw_hand(self):
-        card = self.draw()
-        if card:
-            LOGGER.info('player %s drew card %s to hand', self, card.__name__)
-            self.hand.append(card)
-        else:
+        if self.game.hooks:
+            self.game.emit(Shuffle, self)
+        cards = list(self.discard_pile)
+        self.discard_pile.clear()
+        self.game.random.shuffle(cards)
+        self.deck.extend(cards)
+
+    def draw(self):
+        if not self.deck:
+            self.shuffle()
+        return self.deck.popleft() if self.deck else None
+
+    def draw_many(self, num):
+        """draws up to num cards, shuffling the discard pile at most once"""
+
+        deck = self.deck
+
+        if len(deck) >= num:
+            return [deck.popleft() for _ in range(num)]
+
+        cards = list(deck)
+        deck.clear()
+        self.shuffle()
+        cards.extend(deck.popleft() for _ in range(min(num - len(cards), len(deck))))
+        return cards
+
+    def draw_hand(self, num=1):
+        cards = self.draw_many(num)
+        self.hand.extend(cards)
+        if self.game.verbose:
+            LOGGER.info('player %s drew card(s) %s to hand',
+                        self, ', '.join(card.__name__ for card in cards))
+        if len(cards) < num:
             LOGGER.warning('unable to draw card to hand')
 
+    def cleanup(self):
+        """discards hand and cards in play, then draws a new hand of five cards"""
+
+        self.discard_pile.extend(self.hand)
+        self.discard_pile.extend(type(card) for card in self.in_play)
+        self.hand.clear()
+        self.in_play = []
+        self.draw_hand(5)
+
+        self.actions = 1
+        self.buys = 1
+        self.money_in_play = 0
+        self.spent_money = 0
+
+def _copy_card(card, player):
+    """a shallow copy of the card instance that belongs to the player"""
+
+    copy = object.__new__(type(card))
+    copy.__dict__.update(card.__dict__)
+    copy.player = player
+    copy.game = player.game
+    return copy
+
 class Strategy(object):
     """strategy base class"""
 
+    # class attributes that tune the strategy -> their sensible values, see regno.optimize
+    parameters = {}
+
     def action(self, player, game):
-        LOGGER.info('player has %d action(s)', player.actions)
+        if game.verbose:
+            LOGGER.info('player has %d action(s)', player.actions)
         playable = [card for card in player.hand if 'action' in card.types]
-        return random.choice(playable)(player, game) if playable else None
+        return game.random.choice(playable)(player, game) if playable else None
 
     def treasure(self, player, game):
         for card in player.hand:
@@ -205,15 +638,14 @@ class Strategy(object):
                 return card(player, game)
 
     def buy(self, player, game):
-        LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
-        buyable = [x for x in game.supply.items()
-                   if x[1] > 0 and x[0](player, game).cost <= player.money]
-        random.shuffle(buyable)
-        buyable = sorted(buyable, key=lambda x: -x[0](player, game).cost)
-        return buyable[0][0](player, game) if buyable else None
+        if game.verbose:
+            LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
+        # a random one of the most expensive cards
+        buyable = game.supply.most_expensive(player.money)
+        return game.random.choice(buyable)(player, game) if buyable else None
 
     def reaction(self, player, game):
         reactions = [card for card in player.hand if 'reaction' in card.types]
-        random.shuffle(reactions)
+        game.random.shuffle(reactions)
         for reaction in reactions:
             yield reaction(player, game)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+"""events a game fires to its subscribers, see Game.subscribe
+
+Every event carries the game it happened in. Cards are passed as card classes."""
+
+from __future__ import absolute_import, unicode_literals
+
+from collections import namedtuple
+
+TurnStart = namedtuple('TurnStart', ('game', 'player'))
+Play = namedtuple('Play', ('game', 'player', 'card'))
+Buy = namedtuple('Buy', ('game', 'player', 'card'))
+Gain = namedtuple('Gain', ('game', 'player', 'card'))
+Trash = namedtuple('Trash', ('game', 'player', 'card'))
+# a card taken from the player other than by trashing it, e.g., stolen by Thief
+Lose = namedtuple('Lose', ('game', 'player', 'card'))
+Shuffle = namedtuple('Shuffle', ('game', 'player'))
+GameEnd = namedtuple('GameEnd', ('game',))
+
+EVENTS = (TurnStart, Play, Buy, Gain, Trash, Lose, Shuffle, GameEnd)
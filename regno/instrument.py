@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""optional timing of game phases, strategy decisions and card effects
+
+Instrumenting a game replaces the methods to be timed on the game and strategy
+instances by timed wrappers, so games that are not instrumented pay nothing."""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import time
+
+from collections import defaultdict
+from functools import wraps
+
+PHASES = ('action_phase', 'treasure_phase', 'buy_phase', 'cleanup_phase')
+DECISIONS = ('action', 'treasure', 'buy')
+
+class Timings(object):
+    """cumulative wall time and number of calls per key"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def add(self, key, seconds, calls=1):
+        self.seconds[key] += seconds
+        self.calls[key] += calls
+
+    def update(self, other):
+        """adds the timings of another Timings instance or of its as_dict output"""
+
+        items = other.as_dict().items() if isinstance(other, Timings) else other.items()
+        for key, (seconds, calls) in items:
+            self.add(key, seconds, calls)
+
+    def as_dict(self):
+        """key -> (seconds, calls), e.g., to send timings back from a worker process"""
+
+        return {key: (self.seconds[key], self.calls[key]) for key in self.seconds}
+
+    def timed(self, func, key):
+        """wraps func such that its calls are timed under key (a function of the arguments)"""
+
+        clock = time.perf_counter
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(key(*args, **kwargs) if callable(key) else key, clock() - start)
+
+        wrapper.timed = True
+        return wrapper
+
+    def instrument(self, game):
+        """times the phases of the game, the decisions of its strategies and the cards played
+
+        Cards are timed when played from the hand, so a card played by another card,
+        e.g., by Throne Room, counts towards the latter."""
+
+        for phase in PHASES:
+            setattr(game, phase, self.timed(getattr(game, phase), 'phase: ' + phase[:-6]))
+
+        game.play_card = self.timed(game.play_card, lambda card: 'card: ' + card.name)
+
+        for player in game.players:
+            strategy = player.strategy
+            for decision in DECISIONS:
+                method = getattr(strategy, decision)
+                if getattr(method, 'timed', False):
+                    # strategy instance shared with another instrumented game
+                    continue
+                key = 'strategy: {}.{}'.format(type(strategy).__name__, decision)
+                setattr(strategy, decision, self.timed(method, key))
+            if hasattr(strategy, 'timings'):
+                # strategies that time their own work, e.g., rollouts of MonteCarlo
+                strategy.timings = self
+
+        return game
+
+    def report(self):
+        """table of all keys by descending time"""
+
+        total = sum(self.seconds[key] for key in self.seconds if key.startswith('phase: ')) or 1
+        lines = ['{:<40} {:>10} {:>10} {:>10} {:>7}'.format(
+            '', 'calls', 'total s', 'us/call', 'turn %')]
+        for key in sorted(self.seconds, key=lambda key: -self.seconds[key]):
+            seconds, calls = self.seconds[key], self.calls[key]
+            lines.append('{:<40} {:>10d} {:>10.3f} {:>10.2f} {:>7.1f}'.format(
+                key, calls, seconds, 1e6 * seconds / calls, 100 * seconds / total))
+        return '\n'.join(lines)
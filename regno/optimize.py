@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""search the parameters of a rule-based strategy for the highest win rate
+
+Run with python -m regno.optimize. The parameter space of a strategy is given by its
+parameters attribute, e.g., the money range in which BigMoneySmithy buys a Smithy.
+Candidates are the defaults plus random points of that space, and successive halving
+plays them against fixed opponents: in every round, all remaining candidates play the
+same seeded games, and the better half goes on to play twice as many games in total.
+Candidates are sent to the worker processes as (path, parameters) specs and turned into
+subclasses there, see regno.runner.strategy_class."""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import argparse
+import json
+import logging
+import random
+import sys
+
+from .runner import chunks, default_chunksize, run_jobs, strategy_class
+from .utils import class_from_path
+
+LOGGER = logging.getLogger(__name__)
+
+def defaults(strategy):
+    """the current values of the strategy's parameters"""
+
+    return {name: getattr(strategy, name) for name in strategy.parameters}
+
+def sample_parameters(strategy, count, rng=None):
+    """the defaults and up to count - 1 other random points of the parameter space"""
+
+    rng = rng or random
+    space = list(strategy.parameters.items())
+    if not space:
+        raise ValueError('{} has no parameters to optimize'.format(strategy.__name__))
+
+    size = 1
+    for _, values in space:
+        size *= len(values)
+
+    candidates = [defaults(strategy)]
+    seen = {tuple(sorted(candidates[0].items()))}
+    # the defaults add a candidate unless they are a point of the space
+    inside = all(candidates[0][name] in values for name, values in space)
+    while len(candidates) < min(count, size + (not inside)):
+        parameters = {name: rng.choice(values) for name, values in space}
+        key = tuple(sorted(parameters.items()))
+        if key not in seen:
+            seen.add(key)
+            candidates.append(parameters)
+    return candidates
+
+def successive_halving(path, opponents, candidates, games=50, module=None, cards=(),
+                       seed=None, workers=1, chunksize=None, **kwargs):
+    """plays the candidates against the opponents and returns them ranked, the best first
+
+    path is the dotted path of the strategy, candidates a list of its parameters. Every
+    result is a dict with the parameters, the number of games played and the wins.
+    Candidates that dropped out earlier are ranked behind those that played more games."""
+
+    results = [{'parameters': parameters, 'games': 0, 'wins': 0} for parameters in candidates]
+    names = [strategy_class((path, parameters)).__name__ for parameters in candidates]
+    remaining = list(range(len(candidates)))
+    target = games
+
+    while True:
+        jobs = []
+        for index in remaining:
+            played = results[index]['games']
+            size = chunksize or default_chunksize(
+                (target - played) * len(remaining), workers)
+            for start, number in chunks(target - played, size, played):
+                jobs.append((index, dict(kwargs,
+                                         strategies=[(path, candidates[index])] + list(opponents),
+                                         module=module,
+                                         cards=cards,
+                                         start=start,
+                                         games=number,
+                                         seed=seed,
+                                         summaries=False)))
+
+        for (index, _), result in zip(jobs, run_jobs((job for _, job in jobs), workers)):
+            results[index]['games'] += result['games']
+            results[index]['wins'] += result['wins'][names[index]]
+
+        # stable sort, so ties go to the earlier candidate, e.g., the defaults
+        remaining.sort(key=lambda index: -results[index]['wins'] / results[index]['games'])
+        LOGGER.info('%d candidate(s) after %d games, best: %s with a win rate of %.3f',
+                    len(remaining), target, names[remaining[0]],
+                    results[remaining[0]]['wins'] / target)
+
+        if len(remaining) <= 1:
+            break
+        remaining = remaining[:-(-len(remaining) // 2)]
+        target *= 2
+
+    for result in results:
+        result['win_rate'] = result['wins'] / result['games']
+    return sorted(results, key=lambda result: (-result['games'], -result['win_rate']))
+
+def parse_args():
+    """parse command line arguments"""
+
+    parser = argparse.ArgumentParser(description='optimize the parameters of a strategy')
+    parser.add_argument('strategy',
+                        help='strategy to optimize')
+    parser.add_argument('opponents', nargs='+',
+                        help='strategies to play against')
+    parser.add_argument('-n', '--candidates', type=int, default=16,
+                        help='number of parameter sets to try, including the defaults')
+    parser.add_argument('-c', '--card', nargs='*', default=(),
+                        help='card(s) to include in the set')
+    parser.add_argument('-s', '--set', default='regno.cards.original',
+                        help='card collection')
+    parser.add_argument('-g', '--games', type=int, default=50,
+                        help='number of games per candidate in the first round')
+    parser.add_argument('--seed', type=int,
+                        help='seed of the search')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of worker processes')
+    parser.add_argument('--chunksize', type=int,
+                        help='number of games sent to a worker at a time')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help='log verbosity (repeat to increase)')
+
+    return parser.parse_args()
+
+def main():
+    """main function"""
+
+    args = parse_args()
+
+    logging.basicConfig(stream=sys.stderr,
+                        level=logging.WARNING - 10 * args.verbose)
+
+    strategy = class_from_path(args.strategy)
+    if strategy is None:
+        raise ValueError('unable to import strategy {}'.format(args.strategy))
+
+    opponents = []
+    for opponent in args.opponents:
+        if class_from_path(opponent) is None:
+            LOGGER.warning('unable to import strategy %s', opponent)
+        else:
+            opponents.append(opponent)
+
+    cards = list(filter(None, map(class_from_path, args.card)))
+
+    if args.seed is None:
+        args.seed = random.SystemRandom().getrandbits(63)
+    LOGGER.info('seed of this search: %d', args.seed)
+
+    candidates = sample_parameters(strategy, args.candidates, random.Random(args.seed))
+    ranking = successive_halving(args.strategy, opponents, candidates, games=args.games,
+                                 module=args.set, cards=cards, seed=args.seed,
+                                 workers=args.workers, chunksize=args.chunksize)
+    print(json.dumps({
+        'strategy': args.strategy,
+        'best': ranking[0]['parameters'],
+        'defaults': defaults(strategy),
+        'ranking': ranking,
+    }, indent=4))
+
+if __name__ == '__main__':
+    main()
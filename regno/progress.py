@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""live progress of long runs on the terminal
+
+The reporter is fed the results of whole chunks of games as they come back from the
+workers and redraws a single status line at most once per interval, so its cost does
+not depend on the number of games."""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import sys
+import time
+
+from collections import Counter
+from datetime import timedelta
+
+class Progress(object):
+    """games done, games per second, estimated time left and win rates per strategy"""
+
+    def __init__(self, total, seats, interval=1., file=None):
+        self.total = total
+        self.seats = seats
+        self.interval = interval
+        self.file = file or sys.stderr
+        # redraw the line in place on terminals, print a new line otherwise
+        self.end = '\r' if self.file.isatty() else '\n'
+        self.width = 0
+        self.games = 0
+        self.wins = Counter()
+        self.start = time.monotonic()
+        self.last = self.start
+
+    def update(self, result):
+        """adds the result of a chunk of games, see regno.runner.play_games"""
+
+        self.games += result['games']
+        self.wins.update(result['wins'])
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.write(now)
+
+    def line(self, now=None):
+        """the status line"""
+
+        elapsed = (now or time.monotonic()) - self.start
+        rate = self.games / elapsed if elapsed else 0.
+        left = (self.total - self.games) / rate if rate else None
+        eta = str(timedelta(seconds=round(left))) if left is not None else '?'
+        rates = ' '.join('{} {:.3f}'.format(name, self.wins[name] / (count * self.games))
+                         for name, count in self.seats.items()) if self.games else ''
+        return '{}/{} games {:.1f} games/s ETA {} {}'.format(
+            self.games, self.total, rate, eta, rates)
+
+    def write(self, now=None, end=None):
+        # pad to overwrite the rest of a longer line drawn before
+        line = self.line(now).ljust(self.width)
+        if self.end == '\r':
+            self.width = len(line)
+        self.file.write(line + (end or self.end))
+        self.file.flush()
+
+    def close(self):
+        """writes the final state and ends the line"""
+
+        self.write(end='\n')
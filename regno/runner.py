@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""runs batches of games, either serially or in a pool of worker processes"""
+
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import random
+import signal
+
+from collections import Counter
+from multiprocessing import Pool
+
+from .cards import random_set
+from .columns import Columns, card_names
+from .core import Game
+from .instrument import Timings
+from .trace import Recorder
+from .utils import class_from_path
+
+LOGGER = logging.getLogger(__name__)
+
+def game_seed(seed, index):
+    """derives the seed of game number index from the seed of the whole run"""
+
+    if seed is None:
+        return None
+    # string seeds are hashed with SHA-512, so this is stable across processes and platforms
+    return random.Random('{}:{}'.format(seed, index)).getrandbits(63)
+
+def strategy_class(spec):
+    """the strategy class of a spec: a class, its dotted path or a (path, parameters) pair
+
+    Parameters are class attributes to override. They are set on a subclass named after
+    them, which is created on the spot, so specs can be sent to worker processes
+    where the subclass itself could not be pickled."""
+
+    if isinstance(spec, type):
+        return spec
+    path, parameters = (spec, None) if isinstance(spec, str) else spec
+    cls = class_from_path(path) if isinstance(path, str) else path
+    if cls is None:
+        raise ValueError('unable to import strategy {}'.format(path))
+    if not parameters:
+        return cls
+    name = '{}({})'.format(cls.__name__, ', '.join(
+        '{}={}'.format(key, value) for key, value in sorted(parameters.items())))
+    return type(str(name), (cls,), dict(parameters))
+
+def play_game(strategies, module=None, cards=(), seed=None, timings=None, recorder=None,
+              **kwargs):
+    """sets up a game with a random kingdom from the module and plays it
+
+    Kingdom and game draw from the same generator, so the game is fully determined
+    by its seed and can be replayed in isolation. Pass a Timings instance to time
+    the game's phases, decisions and cards, and a regno.trace.Recorder to trace its
+    turns. Further arguments are passed to Game."""
+
+    rng = random.Random(seed)
+    kingdom = random_set(module, cards=cards, rng=rng)
+    if LOGGER.isEnabledFor(logging.INFO):
+        LOGGER.info('supply: [%s]', ', '.join(sorted(card.__name__ for card in kingdom)))
+    game = Game(kingdom, [strategy() for strategy in strategies], seed=rng, **kwargs)
+    if timings is not None:
+        timings.instrument(game)
+    if recorder is not None:
+        recorder.record(game)
+    game.play()
+    return game
+
+def play_games(strategies, module=None, cards=(), start=0, games=1, seed=None, summaries=True,
+               engine='object', timings=False, columns=False, trace=False, **kwargs):
+    """plays a number of games with the given strategies and returns their results
+
+    The card collection can be passed as a module or as its dotted path, and the strategies
+    as specs (see strategy_class), which allows sending jobs to worker processes. Game
+    number i is seeded with game_seed(seed, i). The result is a dict with the number of
+    games played, the list of game summaries (None unless requested), a Counter of wins
+    per strategy and the number of truncated games. If timings are requested, they are
+    included as returned by Timings.as_dict, if columns are requested, the data of
+    regno.columns.Columns with a row per game and seat, and if a trace is requested, the
+    bytes of the trace records of the games, see regno.trace. Further arguments are passed
+    to Game.
+
+    With engine='batch', the games are played at once by regno.batch, which does not play
+    the kingdom and refuses strategies that would buy from it."""
+
+    strategies = [strategy_class(strategy) for strategy in strategies]
+    if isinstance(module, str):
+        module = class_from_path(module)
+
+    if engine == 'batch':
+        from .batch import play_batch
+        return play_batch(strategies, module=module, cards=cards, start=start, games=games,
+                          seed=seed, summaries=summaries, timings=timings, **kwargs)
+
+    wins = Counter()
+    results = [] if summaries else None
+    timer = Timings() if timings else None
+    table = Columns(card_names(module, cards)) if columns else None
+    recorder = Recorder(start + 1) if trace else None
+    truncated = 0
+
+    for i in range(start, start + games):
+        LOGGER.info('#######################################################')
+        LOGGER.info('##################### Game #%05d #####################', i + 1)
+        LOGGER.info('#######################################################')
+        sub_seed = game_seed(seed, i)
+        game = play_game(strategies, module, cards, sub_seed, timer, recorder, **kwargs)
+        if results is not None:
+            summary = game.stats
+            summary['game'] = i + 1
+            summary['seed'] = sub_seed
+            results.append(summary)
+        if table is not None:
+            table.add(game, i + 1, sub_seed)
+        wins.update(game.winners())
+        truncated += bool(game.truncated)
+
+    return {
+        'games': games,
+        'summaries': results,
+        'wins': wins,
+        'timings': timer.as_dict() if timer else None,
+        'columns': table.data if table is not None else None,
+        'trace': bytes(recorder.buffer) if recorder is not None else None,
+        'truncated': truncated,
+    }
+
+def _play_job(job):
+    return play_games(**job)
+
+def _ignore_interrupt():
+    # only the parent handles Ctrl-C, e.g., to save a checkpoint, and then stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def chunks(games, chunksize, start=0):
+    """splits the games into (start, number) chunks of at most chunksize games"""
+
+    for begin in range(start, start + games, chunksize):
+        yield begin, min(chunksize, start + games - begin)
+
+def default_chunksize(games, workers, engine='object'):
+    """chunks small enough to balance the load, but large enough to keep the overhead low"""
+
+    if engine == 'batch':
+        # the batch engine is only fast with many games at once, and plays whole blocks
+        from .batch import BLOCK
+        return BLOCK * max(1, min(100000 // BLOCK, -(-games // (workers * BLOCK))))
+
+    # serial runs hand out every game on its own, so results can be streamed right away
+    return max(1, min(1000, games // (4 * workers))) if workers > 1 else 1
+
+def run_jobs(jobs, workers=1):
+    """plays the jobs, dicts of arguments to play_games, and yields their results in order
+
+    With more than one worker, the jobs are distributed over a process pool. Each worker
+    only sends back the summaries (if requested) and win counts of its job. Workers ignore
+    SIGINT, the pool is terminated when the generator is closed."""
+
+    if workers > 1:
+        with Pool(workers, initializer=_ignore_interrupt) as pool:
+            for result in pool.imap(_play_job, jobs):
+                yield result
+
+    else:
+        for job in jobs:
+            yield _play_job(job)
+
+def run(strategies, module=None, cards=(), games=1, start=0, seed=None,
+        workers=1, chunksize=None, summaries=True, engine='object', timings=False, **kwargs):
+    """plays the games in chunks and yields the results of each chunk in order
+
+    Every game is seeded independently from seed, so the results do not depend on
+    the number of workers. Further arguments are passed to play_games."""
+
+    chunksize = chunksize or default_chunksize(games, workers, engine)
+    jobs = (dict(kwargs,
+                 strategies=strategies,
+                 module=module,
+                 cards=cards,
+                 start=begin,
+                 games=number,
+                 seed=seed,
+                 summaries=summaries,
+                 engine=engine,
+                 timings=timings)
+            for begin, number in chunks(games, chunksize, start))
+
+    for result in run_jobs(jobs, workers):
+        yield result
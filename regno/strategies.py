@@ -5,7 +5,9 @@
 from __future__ import absolute_import, unicode_literals
 
 import logging
-import random
+import time
+
+from collections import deque
 
 from .core import Strategy
 from .cards.base import Copper, Curse, Silver, Gold, Estate, Duchy, Province
@@ -17,13 +19,11 @@ class Smarter(Strategy):
     """play random, but a little smarter"""
 
     def action(self, player, game):
-        LOGGER.info('player has %d action(s)', player.actions)
+        if game.verbose:
+            LOGGER.info('player has %d action(s)', player.actions)
         playable = [card for card in player.hand if 'action' in card.types]
-        random.shuffle(playable)
-        playable = sorted(playable, key=lambda x: -x(player, game).buys)
-        playable = sorted(playable, key=lambda x: -x(player, game).cards)
-        playable = sorted(playable, key=lambda x: -x(player, game).money)
-        playable = sorted(playable, key=lambda x: -x(player, game).actions)
+        game.random.shuffle(playable)
+        playable.sort(key=lambda x: (-x.actions, -x.money, -x.cards, -x.buys))
         return playable[0](player, game) if playable else None
 
     def buy(self, player, game):
@@ -40,20 +40,34 @@ class BigMoney(Strategy):
     interesting_cards = frozenset((Province, Duchy, Estate, Gold, Silver))
 
     def buy(self, player, game):
-        LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
-        buyable = [x for x in game.supply.items()
-                   if (x[1] > 0 and x[0](player, game).cost <= player.money
-                       and x[0] in self.interesting_cards)]
-        buyable = sorted(buyable, key=lambda x: -x[0](player, game).cost)
-        return buyable[0][0](player, game) if buyable else None
+        if game.verbose:
+            LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
+        for cards in game.supply.costing(player.money):
+            for card in cards:
+                if card in self.interesting_cards:
+                    return card(player, game)
+        return None
 
 class BigMoneySmithy(BigMoney, Smarter):
     """add a few smithies, but otherwise money"""
 
+    smithy_min_money = 4
+    smithy_max_money = 5
+    max_smithies = 3
+
+    # ranges searched by regno.optimize
+    parameters = {
+        'smithy_min_money': range(3, 9),
+        'smithy_max_money': range(4, 9),
+        'max_smithies': range(0, 6),
+    }
+
     def buy(self, player, game):
-        LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
+        if game.verbose:
+            LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
 
-        if 4 <= player.money <= 5 and game.supply.get(Smithy) and player.counter[Smithy] < 3:
+        if (self.smithy_min_money <= player.money <= self.smithy_max_money
+                and game.supply.get(Smithy) and player.counter[Smithy] < self.max_smithies):
             return Smithy(player, game)
 
         return super().buy(player, game)
@@ -61,10 +75,21 @@ class BigMoneySmithy(BigMoney, Smarter):
 class BigMoneyFestival(BigMoneySmithy):
     """add a few smithies and festivals, but otherwise money"""
 
+    festival_min_money = 5
+    festival_max_money = 5
+    max_festivals = 2
+
+    parameters = dict(BigMoneySmithy.parameters,
+                      festival_min_money=range(5, 9),
+                      festival_max_money=range(5, 9),
+                      max_festivals=range(0, 6))
+
     def buy(self, player, game):
-        LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
+        if game.verbose:
+            LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
 
-        if player.money == 5 and game.supply.get(Festival) and player.counter[Festival] < 2:
+        if (self.festival_min_money <= player.money <= self.festival_max_money
+                and game.supply.get(Festival) and player.counter[Festival] < self.max_festivals):
             return Festival(player, game)
 
         return super().buy(player, game)
@@ -72,8 +97,19 @@ class BigMoneyFestival(BigMoneySmithy):
 class BigMoneyMiner(BigMoney):
     """buy a few mines to upgrade your money"""
 
+    mine_min_money = 5
+    mine_max_money = 7
+    max_mines = 3
+
+    parameters = {
+        'mine_min_money': range(5, 9),
+        'mine_max_money': range(5, 9),
+        'max_mines': range(0, 6),
+    }
+
     def action(self, player, game):
-        LOGGER.info('player has %d action(s)', player.actions)
+        if game.verbose:
+            LOGGER.info('player has %d action(s)', player.actions)
 
         if Mine in player.hand and (Copper in player.hand or Silver in player.hand):
             if Silver in player.hand:
@@ -84,9 +120,11 @@ class BigMoneyMiner(BigMoney):
         return super().action(player, game)
 
     def buy(self, player, game):
-        LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
+        if game.verbose:
+            LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
 
-        if 5 <= player.money <= 7 and game.supply.get(Mine) and player.counter[Mine] < 3:
+        if (self.mine_min_money <= player.money <= self.mine_max_money
+                and game.supply.get(Mine) and player.counter[Mine] < self.max_mines):
             return Mine(player, game)
 
         return super().buy(player, game)
@@ -94,10 +132,22 @@ class BigMoneyMiner(BigMoney):
 class BigMoneyWitch(BigMoney, Smarter):
     """add a few witches, but otherwise money"""
 
+    witch_min_money = 5
+    witch_max_money = 5
+    max_witches = 3
+
+    parameters = {
+        'witch_min_money': range(5, 9),
+        'witch_max_money': range(5, 9),
+        'max_witches': range(0, 6),
+    }
+
     def buy(self, player, game):
-        LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
+        if game.verbose:
+            LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
 
-        if player.money == 5 and game.supply.get(Witch) and player.counter[Witch] < 3:
+        if (self.witch_min_money <= player.money <= self.witch_max_money
+                and game.supply.get(Witch) and player.counter[Witch] < self.max_witches):
             return Witch(player, game)
 
         return super().buy(player, game)
@@ -105,8 +155,32 @@ class BigMoneyWitch(BigMoney, Smarter):
 class Gardener(Smarter):
     """bloat your deck as much as possible to make points with gardens"""
 
+    # Markets replace Festivals once they are gone
+    festival_money = 5
+    max_festivals = 3
+    thief_min_money = 4
+    thief_max_money = 5
+    max_thieves = 3
+    gardens_min_money = 4
+    gardens_max_money = 5
+    woodcutter_money = 3
+    max_woodcutters = 2
+
+    parameters = {
+        'festival_money': range(3, 9),
+        'max_festivals': range(0, 6),
+        'thief_min_money': range(4, 9),
+        'thief_max_money': range(4, 9),
+        'max_thieves': range(0, 6),
+        'gardens_min_money': range(4, 9),
+        'gardens_max_money': range(4, 9),
+        'woodcutter_money': range(3, 9),
+        'max_woodcutters': range(0, 6),
+    }
+
     def action(self, player, game):
-        LOGGER.info('player has %d action(s)', player.actions)
+        if game.verbose:
+            LOGGER.info('player has %d action(s)', player.actions)
 
         candidate = super().action(player, game)
 
@@ -120,19 +194,24 @@ class Gardener(Smarter):
             return Thief(player, game, to_gain={Gold, Silver, Copper})
 
     def buy(self, player, game):
-        LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
+        if game.verbose:
+            LOGGER.info('player has %d buy(s) and %d money', player.buys, player.money)
 
-        if player.money == 5 and game.supply.get(Festival) and player.counter[Festival] < 3:
+        if player.money == self.festival_money and game.supply.get(Festival) \
+                and player.counter[Festival] < self.max_festivals:
             card = Festival(player, game)
-        elif player.money == 5 and not game.supply.get(Festival) \
+        elif player.money == self.festival_money and not game.supply.get(Festival) \
                 and game.supply.get(Market) \
-                and player.counter[Festival] + player.counter[Market] < 3:
+                and player.counter[Festival] + player.counter[Market] < self.max_festivals:
             card = Market(player, game)
-        elif 4 <= player.money <= 5 and game.supply.get(Thief) and player.counter[Thief] < 3:
+        elif self.thief_min_money <= player.money <= self.thief_max_money \
+                and game.supply.get(Thief) and player.counter[Thief] < self.max_thieves:
             card = Thief(player, game)
-        elif 4 <= player.money <= 5 and game.supply.get(Gardens):
+        elif self.gardens_min_money <= player.money <= self.gardens_max_money \
+                and game.supply.get(Gardens):
             card = Gardens(player, game)
-        elif player.money == 3 and game.supply.get(Woodcutter) and player.counter[Woodcutter] < 2:
+        elif player.money == self.woodcutter_money and game.supply.get(Woodcutter) \
+                and player.counter[Woodcutter] < self.max_woodcutters:
             card = Woodcutter(player, game)
         else:
             card = super().buy(player, game)
@@ -140,3 +219,115 @@ class Gardener(Smarter):
                 card = Copper(player, game)
 
         return card
+
+class MonteCarlo(Smarter):
+    """buy (and optionally play) whatever wins the most playouts from the current state
+
+    Every candidate decision is tried in clones of the game in which all players follow
+    the playout strategy, round-robin until the time budget per decision is used up,
+    or exactly rollouts times per candidate if set, which keeps seeded games reproducible.
+    A rollout counts as won if the player leads when the game ends or after horizon
+    turns, ties are split. Rollouts do not peek at the order of the decks."""
+
+    # seconds per decision, unless rollouts per candidate are given
+    time_budget = .1
+    rollouts = None
+    # turns per rollout until the points decide
+    horizon = 200
+    playout = BigMoney
+    # also decide which actions to play, otherwise the Smarter way
+    decide_actions = False
+
+    # set by regno.instrument.Timings.instrument to report the rollouts per second
+    timings = None
+
+    def action(self, player, game):
+        if not self.decide_actions:
+            return super().action(player, game)
+
+        candidates = sorted({card for card in player.hand if 'action' in card.types},
+                            key=lambda card: card.__name__)
+        card = self.search(player, game, candidates + [None], self._after_action)
+        return card(player, game) if card else None
+
+    def buy(self, player, game):
+        candidates = [card for cards in game.supply.costing(player.money)
+                      for card in sorted(cards, key=lambda card: card.__name__)]
+        card = self.search(player, game, candidates + [None], self._after_buy)
+        return card(player, game) if card else None
+
+    @staticmethod
+    def _after_action(game, player, card):
+        if card is not None:
+            player.hand.remove(card)
+            player.actions -= 1
+            game.play_card(card(player, game))
+            game.action_phase(player)
+        game.treasure_phase(player)
+        game.buy_phase(player)
+
+    @staticmethod
+    def _after_buy(game, player, card):
+        if card is not None:
+            player.buys -= 1
+            card(player, game).buy()
+            game.buy_phase(player)
+
+    def search(self, player, game, candidates, finish_turn):
+        """the candidate with the highest share of won rollouts, the first one on ties"""
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        index = game.players.index(player)
+        wins = [0] * len(candidates)
+        tries = [0] * len(candidates)
+        start = time.perf_counter()
+        while True:
+            for i, candidate in enumerate(candidates):
+                wins[i] += self.rollout(game, index, candidate, finish_turn)
+                tries[i] += 1
+            if self.rollouts is not None:
+                if tries[0] >= self.rollouts:
+                    break
+            elif time.perf_counter() - start >= self.time_budget:
+                break
+        elapsed = time.perf_counter() - start
+
+        count = sum(tries)
+        if self.timings is not None:
+            self.timings.add('rollouts: {}'.format(type(self).__name__), elapsed, count)
+        if game.verbose:
+            LOGGER.info('%d rollouts in %.3f s (%.0f rollouts/s)', count, elapsed,
+                        count / elapsed if elapsed else 0)
+
+        best = max(range(len(candidates)), key=lambda i: (wins[i] / tries[i], -i))
+        return candidates[best]
+
+    def rollout(self, game, index, candidate, finish_turn):
+        """plays a clone of the game after the candidate decision, returns the share of the win"""
+
+        clone = game.clone()
+        clone.verbose = False
+        clone.random.seed(game.random.getrandbits(64))
+        policy = self.playout()
+        for other in clone.players:
+            other.strategy = policy
+            cards = list(other.deck)
+            clone.random.shuffle(cards)
+            other.deck = deque(cards)
+
+        player = clone.players[index]
+        finish_turn(clone, player, candidate)
+        clone.cleanup_phase(player)
+        clone.next_turn()
+
+        for _ in range(self.horizon):
+            if clone.finished():
+                break
+            clone.play_round(clone.players[clone.current_player])
+            clone.next_turn()
+
+        points = [other.victory_points for other in clone.players]
+        best = max(points)
+        return (points[index] == best) / points.count(best)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""sweep over many kingdoms to see how strategies fare on each of them
+
+Run with python -m regno.sweep. Kingdoms are either all combinations of the cards in a
+collection or a stratified sample in which every card appears about equally often. Each
+kingdom plays the same seeded games, and only win counts are kept, so sweeps over
+thousands of kingdoms run in constant memory. Results are written as one JSON line per
+kingdom as they come in, followed by a line with the marginal win rates per card."""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import argparse
+import json
+import logging
+import random
+import sys
+
+from collections import Counter, defaultdict, deque
+from itertools import combinations
+
+from .cards import BASESET, card_classes
+from .runner import chunks, run_jobs
+from .utils import class_from_path
+
+LOGGER = logging.getLogger(__name__)
+
+def kingdom_cards(module, required=()):
+    """the module's cards that can complete a kingdom, sorted by name
+
+    Base cards the module imports are no kingdom cards."""
+
+    return sorted((card for card in card_classes(module)
+                   if card not in required and card not in BASESET),
+                  key=lambda card: card.__name__)
+
+def all_kingdoms(module, required=(), num=10):
+    """every kingdom of num cards from the module that contains the required cards"""
+
+    required = tuple(required)
+    available = kingdom_cards(module, required)
+    for cards in combinations(available, num - len(required)):
+        yield required + cards
+
+def sample_kingdoms(module, count, required=(), num=10, rng=None):
+    """count kingdoms in which every card of the module appears about equally often
+
+    Shuffles the available cards and deals them out into kingdoms, reshuffling once
+    all cards have been dealt, so the frequencies of any two cards differ by one at most."""
+
+    rng = rng or random
+    required = tuple(required)
+    available = kingdom_cards(module, required)
+    remaining = num - len(required)
+    if remaining > len(available):
+        raise ValueError('not enough cards for a kingdom of {} cards'.format(num))
+
+    deck = []
+    for _ in range(count):
+        kingdom = []
+        skipped = []
+        while len(kingdom) < remaining:
+            if not deck:
+                deck = list(available)
+                rng.shuffle(deck)
+            card = deck.pop()
+            # cards already in the kingdom stay up for the next one
+            (skipped if card in kingdom else kingdom).append(card)
+        deck.extend(skipped)
+        yield required + tuple(sorted(kingdom, key=lambda card: card.__name__))
+
+def sweep(strategies, kingdoms, games=100, seed=None, workers=1, chunksize=None, **kwargs):
+    """plays games on every kingdom and yields (kingdom, games, wins) as they are done"""
+
+    def jobs():
+        for kingdom in kingdoms:
+            for start, number in chunks(games, chunksize or games):
+                yield dict(kwargs,
+                           strategies=strategies,
+                           cards=kingdom,
+                           start=start,
+                           games=number,
+                           seed=seed,
+                           summaries=False)
+
+    kingdom, played, wins = None, 0, Counter()
+    # jobs of the same kingdom come back one after another
+    for job, result in _with_jobs(jobs(), workers):
+        if job['cards'] != kingdom:
+            if kingdom is not None:
+                yield kingdom, played, wins
+            kingdom, played, wins = job['cards'], 0, Counter()
+        played += result['games']
+        wins.update(result['wins'])
+
+    if kingdom is not None:
+        yield kingdom, played, wins
+
+def _with_jobs(jobs, workers):
+    """pairs the jobs with their results without holding all jobs in memory"""
+
+    pending = deque()
+
+    def remember():
+        for job in jobs:
+            pending.append(job)
+            yield job
+
+    for result in run_jobs(remember(), workers):
+        yield pending.popleft(), result
+
+def win_rates(wins, seats, games):
+    """win rate per seat for every strategy"""
+
+    return {name: wins.get(name, 0) / (count * games) for name, count in seats.items()}
+
+def parse_args():
+    """parse command line arguments"""
+
+    parser = argparse.ArgumentParser(description='sweep over kingdoms')
+    parser.add_argument('strategies', nargs='+',
+                        help='strategies')
+    parser.add_argument('-c', '--card', nargs='*', default=(),
+                        help='card(s) required in every kingdom')
+    parser.add_argument('-s', '--set', default='regno.cards.original',
+                        help='card collection')
+    parser.add_argument('-k', '--kingdoms', type=int,
+                        help='number of kingdoms to sample (default: all combinations)')
+    parser.add_argument('-g', '--games', type=int, default=100,
+                        help='number of games per kingdom')
+    parser.add_argument('--seed', type=int,
+                        help='seed of the sweep')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of worker processes')
+    parser.add_argument('--chunksize', type=int,
+                        help='number of games sent to a worker at a time')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help='log verbosity (repeat to increase)')
+
+    return parser.parse_args()
+
+def main():
+    """main function"""
+
+    args = parse_args()
+
+    logging.basicConfig(stream=sys.stderr,
+                        level=logging.WARNING - 10 * args.verbose)
+
+    strategies = []
+    for strategy in args.strategies:
+        cls = class_from_path(strategy)
+        if cls is None:
+            LOGGER.warning('unable to import strategy %s', strategy)
+        else:
+            strategies.append(cls)
+
+    module = class_from_path(args.set)
+    required = tuple(filter(None, map(class_from_path, args.card)))
+
+    if args.seed is None:
+        args.seed = random.SystemRandom().getrandbits(63)
+    LOGGER.info('seed of this sweep: %d', args.seed)
+
+    if args.kingdoms:
+        kingdoms = sample_kingdoms(module, args.kingdoms, required, rng=random.Random(args.seed))
+    else:
+        kingdoms = all_kingdoms(module, required)
+
+    seats = Counter(strategy.__name__ for strategy in strategies)
+    card_games = Counter()
+    card_wins = defaultdict(Counter)
+
+    for kingdom, games, wins in sweep(strategies, kingdoms, games=args.games, seed=args.seed,
+                                      workers=args.workers, chunksize=args.chunksize):
+        names = [card.__name__ for card in kingdom]
+        print(json.dumps({
+            'kingdom': names,
+            'games': games,
+            'win_rates': win_rates(wins, seats, games),
+        }, separators=(',', ':')))
+        sys.stdout.flush()
+
+        for name in names:
+            card_games[name] += games
+            card_wins[name].update(wins)
+
+    print(json.dumps({'cards': {
+        name: {'games': card_games[name],
+               'win_rates': win_rates(card_wins[name], seats, card_games[name])}
+        for name in sorted(card_games)}}, separators=(',', ':')))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+"""round-robin tournament between a list of strategies
+
+Run with python -m regno.tournament. Every combination of strategies plays the same
+number of games. Seats are not shuffled but rotated, and every rotation of a matchup
+plays the same seeded games, so no strategy profits from its seat or luck of the draw.
+All games of the tournament are scheduled as one batch of jobs."""
+
+from __future__ import absolute_import, division, unicode_literals
+
+import argparse
+import json
+import logging
+import random
+import sys
+
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from .runner import chunks, default_chunksize, run_jobs
+from .utils import class_from_path
+
+LOGGER = logging.getLogger(__name__)
+
+def rotations(strategies):
+    """all cyclic rotations of the seat order"""
+
+    strategies = tuple(strategies)
+    return [strategies[i:] + strategies[:i] for i in range(len(strategies))]
+
+def matchups(strategies, players=2):
+    """all combinations of the given number of different strategies"""
+
+    return list(combinations(strategies, players))
+
+def schedule(strategies, players=2, games=100, module=None, cards=(), seed=None,
+             workers=1, chunksize=None, **kwargs):
+    """jobs for every rotation of every matchup, see regno.runner.run_jobs"""
+
+    pairings = matchups(strategies, players)
+    per_rotation = -(-games // players)
+    size = chunksize or default_chunksize(per_rotation * players * len(pairings), workers)
+
+    jobs = []
+    for matchup in pairings:
+        for seating in rotations(matchup):
+            for start, number in chunks(per_rotation, size):
+                jobs.append(dict(kwargs,
+                                 strategies=seating,
+                                 module=module,
+                                 cards=cards,
+                                 start=start,
+                                 games=number,
+                                 seed=seed,
+                                 summaries=False,
+                                 shuffle_seats=False))
+    return jobs
+
+def tournament(strategies, players=2, games=100, module=None, cards=(), seed=None,
+               workers=1, chunksize=None, **kwargs):
+    """plays the tournament and returns the win rate matrix
+
+    matrix[a][b] is the share of games strategy a won among all games where a and b met,
+    overall[a] the share of all games a won. Ties count as a win for every leader."""
+
+    strategies = list(strategies)
+    jobs = schedule(strategies, players, games, module, cards, seed, workers, chunksize, **kwargs)
+
+    wins = defaultdict(Counter)
+    played = defaultdict(Counter)
+
+    for job, result in zip(jobs, run_jobs(jobs, workers)):
+        names = [strategy.__name__ for strategy in job['strategies']]
+        for name in names:
+            for other in names:
+                if other != name:
+                    wins[name][other] += result['wins'][name]
+                    played[name][other] += result['games']
+            wins[name][None] += result['wins'][name]
+            played[name][None] += result['games']
+
+    names = [strategy.__name__ for strategy in strategies]
+    return {
+        'matrix': {name: {other: wins[name][other] / played[name][other]
+                          for other in names if played[name][other]}
+                   for name in names},
+        'overall': {name: wins[name][None] / played[name][None]
+                    for name in names if played[name][None]},
+        'games': {name: played[name][None] for name in names},
+    }
+
+def parse_args():
+    """parse command line arguments"""
+
+    parser = argparse.ArgumentParser(description='round-robin tournament between strategies')
+    parser.add_argument('strategies', nargs='+',
+                        help='strategies')
+    parser.add_argument('-n', '--players', type=int, default=2,
+                        help='number of players per game')
+    parser.add_argument('-c', '--card', nargs='*', default=(),
+                        help='card(s) to include in the set')
+    parser.add_argument('-s', '--set', default='regno.cards.original',
+                        help='card collection')
+    parser.add_argument('-g', '--games', type=int, default=100,
+                        help='number of games per matchup')
+    parser.add_argument('--seed', type=int,
+                        help='seed of the tournament')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of worker processes')
+    parser.add_argument('--chunksize', type=int,
+                        help='number of games sent to a worker at a time')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help='log verbosity (repeat to increase)')
+
+    return parser.parse_args()
+
+def main():
+    """main function"""
+
+    args = parse_args()
+
+    logging.basicConfig(stream=sys.stderr,
+                        level=logging.WARNING - 10 * args.verbose)
+
+    strategies = []
+    for strategy in args.strategies:
+        cls = class_from_path(strategy)
+        if cls is None:
+            LOGGER.warning('unable to import strategy %s', strategy)
+        else:
+            strategies.append(cls)
+
+    if len(strategies) < args.players:
+        raise ValueError('specify at least {} strategies'.format(args.players))
+
+    cards = list(filter(None, map(class_from_path, args.card)))
+
+    if args.seed is None:
+        args.seed = random.SystemRandom().getrandbits(63)
+    LOGGER.info('seed of this tournament: %d', args.seed)
+
+    result = tournament(strategies, players=args.players, games=args.games, module=args.set,
+                        cards=cards, seed=args.seed, workers=args.workers,
+                        chunksize=args.chunksize)
+    print(json.dumps(result, indent=4))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+"""compact binary traces of every turn of a game, and a reader to replay them
+
+A trace file starts with a header (magic, version, seed of the run) followed by fixed
+size records (kind, seat, card, value), see RECORD and the record kinds below. Each game
+starts with a GAME record and is self-contained: cards are numbered in order of their
+first appearance in the game, and a NAME record followed by the padded name of the card
+introduces every number. Card ids from regno.cards.base.REGISTRY are not used, since they
+depend on the order in which cards are imported.
+
+The Recorder subscribes to the events of a game (see regno.events) and appends records
+to a byte buffer, so traces can be sent back from worker processes and appended to one
+file. Reading a trace never needs the code of the cards or strategies. Run python -m
+regno.trace to print a line per game of a trace file, or every turn of one game."""
+
+from __future__ import absolute_import, unicode_literals
+
+import argparse
+import json
+import mmap
+import os
+import struct
+
+from collections import Counter, namedtuple
+
+from .events import Buy, Gain, GameEnd, Lose, Play, Shuffle, Trash, TurnStart
+
+MAGIC = b'RGNT'
+VERSION = 1
+
+HEADER = struct.Struct('<4sBq')
+RECORD = struct.Struct('<BBHi')
+
+# value: number of the game
+GAME = 1
+# card: number of the card in this game, value: length of its UTF-8 name, which follows
+# padded with zeros to a multiple of the record size
+NAME = 2
+# card, value: size of its supply pile at the start
+SUPPLY = 3
+# seat, value: number of the turn, counting from zero
+TURN = 4
+# seat, card, value: number of these cards in the hand at the start of the turn
+HAND = 5
+# seat, card
+PLAY = 6
+# seat, card, value: money the player has left after buying it
+BUY = 7
+# seat, card
+GAIN = 8
+TRASH = 9
+LOSE = 10
+# seat
+SHUFFLE = 11
+# seat, value: victory points at the end of the game
+SCORE = 12
+# value: number of turns
+END = 13
+
+NAMES = {PLAY: 'play', BUY: 'buy', GAIN: 'gain', TRASH: 'trash', LOSE: 'lose',
+         SHUFFLE: 'shuffle'}
+
+# cards every player starts with
+START = (('Copper', 7), ('Estate', 3))
+
+class Recorder(object):
+    """records the games passed to record into a buffer of trace records"""
+
+    def __init__(self, first=1):
+        self.buffer = bytearray()
+        self.number = first
+        self.ids = {}
+        self.seats = {}
+
+    def _record(self, kind, seat=0, card=0, value=0):
+        self.buffer += RECORD.pack(kind, seat, card, value)
+
+    def _card(self, card):
+        try:
+            return self.ids[card]
+        except KeyError:
+            card_id = self.ids[card] = len(self.ids)
+            name = card.__name__.encode('utf-8')
+            self._record(NAME, 0, card_id, len(name))
+            self.buffer += name.ljust(-(-len(name) // RECORD.size) * RECORD.size, b'\0')
+            return card_id
+
+    def record(self, game):
+        """writes the start of the game and subscribes to its events"""
+
+        self.ids = {}
+        self.seats = {player: seat for seat, player in enumerate(game.players)}
+        self._record(GAME, value=self.number)
+        self.number += 1
+        for card, count in sorted(game.supply.items(), key=lambda item: item[0].__name__):
+            self._record(SUPPLY, 0, self._card(card), count)
+
+        game.subscribe(TurnStart, self.turn_start)
+        for event, kind in ((Play, PLAY), (Gain, GAIN), (Trash, TRASH), (Lose, LOSE)):
+            game.subscribe(event, self._card_event(kind))
+        game.subscribe(Buy, self.buy)
+        game.subscribe(Shuffle, self.shuffle)
+        game.subscribe(GameEnd, self.game_end)
+        return game
+
+    def _card_event(self, kind):
+        def callback(event):
+            self._record(kind, self.seats[event.player], self._card(event.card))
+        return callback
+
+    def turn_start(self, event):
+        game = event.game
+        seat = self.seats[event.player]
+        self._record(TURN, seat, 0, game.current_round * len(game.players) + seat)
+        for card, count in Counter(event.player.hand).items():
+            self._record(HAND, seat, self._card(card), count)
+
+    def buy(self, event):
+        self._record(BUY, self.seats[event.player], self._card(event.card), event.player.money)
+
+    def shuffle(self, event):
+        self._record(SHUFFLE, self.seats[event.player])
+
+    def game_end(self, event):
+        game = event.game
+        for player, seat in self.seats.items():
+            self._record(SCORE, seat, 0, player.victory_points)
+        self._record(END, value=game.current_round * len(game.players) + game.current_player)
+
+class Writer(object):
+    """appends traces to a file, resuming at position if given, see regno.checkpoint"""
+
+    def __init__(self, path, seed=None, position=None):
+        self.file = open(path, 'r+b' if position is not None else 'wb')
+        if position is None:
+            self.file.write(HEADER.pack(MAGIC, VERSION, -1 if seed is None else seed))
+        else:
+            self.file.seek(position)
+            self.file.truncate()
+
+    def write(self, trace):
+        self.file.write(trace)
+
+    def position(self):
+        self.file.flush()
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+# events are (kind, seat, card, value) tuples in the order they happened, with card names
+Turn = namedtuple('Turn', ('number', 'seat', 'hand', 'events'))
+TracedGame = namedtuple('TracedGame', ('number', 'supply', 'turns', 'scores', 'length'))
+
+def records(buffer):
+    """yields the header and then all records as (kind, seat, card, value, name)
+
+    name is the card name for NAME records, None otherwise."""
+
+    magic, version, seed = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a trace file of version {}'.format(VERSION))
+    yield seed if seed >= 0 else None
+
+    offset = HEADER.size
+    end = len(buffer)
+    while offset < end:
+        kind, seat, card, value = RECORD.unpack_from(buffer, offset)
+        offset += RECORD.size
+        name = None
+        if kind == NAME:
+            name = bytes(buffer[offset:offset + value]).decode('utf-8')
+            offset += -(-value // RECORD.size) * RECORD.size
+        yield kind, seat, card, value, name
+
+def games(buffer):
+    """yields the TracedGame of every game in the buffer, e.g., a memory map of a file
+
+    Cards are given by name, turns as Turn tuples in the order they were played."""
+
+    game = turn = None
+    names = {}
+
+    items = records(buffer)
+    next(items)
+    for kind, seat, card, value, name in items:
+        if kind == GAME:
+            if game is not None:
+                yield game
+            names = {}
+            game = TracedGame(value, {}, [], {}, None)
+        elif kind == NAME:
+            names[card] = name
+        elif kind == SUPPLY:
+            game.supply[names[card]] = value
+        elif kind == TURN:
+            turn = Turn(value, seat, Counter(), [])
+            game.turns.append(turn)
+        elif kind == HAND:
+            turn.hand[names[card]] = value
+        elif kind in (PLAY, BUY, GAIN, TRASH, LOSE, SHUFFLE):
+            turn.events.append((kind, seat, None if kind == SHUFFLE else names[card], value))
+        elif kind == SCORE:
+            game.scores[seat] = value
+        elif kind == END:
+            game = game._replace(length=value)
+
+    if game is not None:
+        yield game
+
+def read(path):
+    """yields the seed of the run and then the TracedGame of every game in the file"""
+
+    with open(path, 'rb') as file:
+        if not os.fstat(file.fileno()).st_size:
+            raise ValueError('empty trace file {}'.format(path))
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield next(records(buffer))
+            for game in games(buffer):
+                yield game
+
+def replay(game):
+    """yields every turn of the traced game with the supply and the decks after the turn
+
+    The supply and the decks are updated in place, copy them to keep them.
+
+    Decks are Counters of card names per seat, since the trace tells what every player
+    owns but not the order of the cards."""
+
+    supply = Counter(game.supply)
+    seats = 1 + max(game.scores) if game.scores else 0
+    decks = [Counter(dict(START)) for _ in range(seats)]
+
+    for turn in game.turns:
+        stolen = None
+        for kind, seat, card, _ in turn.events:
+            if kind == GAIN:
+                decks[seat][card] += 1
+                # stolen cards come from another player, not from the supply
+                if card != stolen:
+                    supply[card] -= 1
+                stolen = None
+            elif kind in (TRASH, LOSE):
+                decks[seat][card] -= 1
+                stolen = card if kind == LOSE else None
+        yield turn, supply, decks
+
+def parse_args():
+    """parse command line arguments"""
+
+    parser = argparse.ArgumentParser(description='read a trace file')
+    parser.add_argument('file',
+                        help='trace file')
+    parser.add_argument('-g', '--game', type=int,
+                        help='print every turn of the game with this number instead')
+
+    return parser.parse_args()
+
+def main():
+    """main function"""
+
+    from .runner import game_seed
+
+    args = parse_args()
+
+    items = read(args.file)
+    seed = next(items)
+
+    for game in items:
+        if args.game is None:
+            # the seed of the game itself, as in the summaries and columns of the run
+            print(json.dumps({'game': game.number, 'seed': game_seed(seed, game.number - 1),
+                              'turns': game.length,
+                              'scores': [game.scores[seat] for seat in sorted(game.scores)],
+                              'supply': game.supply}, separators=(',', ':')))
+        elif game.number == args.game:
+            for turn, supply, decks in replay(game):
+                print(json.dumps({
+                    'turn': turn.number,
+                    'seat': turn.seat,
+                    'hand': turn.hand,
+                    'events': [(NAMES[kind], seat, card) + ((value,) if kind == BUY else ())
+                               for kind, seat, card, value in turn.events],
+                    'decks': [{card: count for card, count in deck.items() if count}
+                              for deck in decks],
+                }, separators=(',', ':')))
+            break
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,9 @@
 
 """utility functions"""
 
-from __future__ import unicode_literals
+from __future__ import division, unicode_literals
+
+import math
 
 from importlib import import_module
 
@@ -25,3 +27,23 @@ def class_from_path(path):
 
     except ImportError:
         return None
+
+def wilson_interval(successes, trials, z=1.96):
+    """Wilson score interval for a binomial proportion, 95% confidence by default"""
+
+    if not trials:
+        return 0.0, 1.0
+
+    rate = successes / trials
+    denominator = 1 + z * z / trials
+    center = (rate + z * z / (2 * trials)) / denominator
+    spread = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - spread), min(1.0, center + spread)
+
+def win_rate_intervals(wins, seats, games, z=1.96):
+    """confidence intervals of the win rate per seat for every strategy
+
+    wins maps strategy names to their wins, seats to the number of seats they took per game."""
+
+    return {name: wilson_interval(wins.get(name, 0), count * games, z)
+            for name, count in seats.items()}